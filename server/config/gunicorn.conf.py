@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration, used by the Dockerfile.
+
+SERVER_MODE=wsgi (default) serves config.wsgi with sync workers, one request
+per process at a time. SERVER_MODE=asgi serves config.asgi with uvicorn
+workers, where a slow client or a query wait no longer holds a whole process.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+if server_mode == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'sync'
+
+# Workers write their request metrics (src.profiling) here, so /metrics can
+# merge them whichever worker serves the scrape. Cleared on every start.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+def on_starting(server):
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
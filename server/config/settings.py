@@ -35,6 +35,30 @@ DEBUG = os.environ.get('DJANGO_DEBUG', 'True').lower() == 'true'
 
 ALLOWED_HOSTS = []
 
+# 'wsgi' (sync gunicorn workers) or 'asgi' (uvicorn workers, see gunicorn.conf.py).
+# Under ASGI the product and sale read endpoints are served by async views.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+# Serve product and sale lists through compiled row serializers (src.row_serializers)
+# and orjson instead of DRF's serializers and JSON encoder; the output is the same.
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', 'False').lower() == 'true'
+
+# Largest POST /sales/bulk/ accepted, in sales and in line items. The whole
+# payload is one transaction holding row locks on every product it sells.
+SALES_BULK_MAX = int(os.environ.get('SALES_BULK_MAX', '500'))
+SALES_BULK_MAX_ITEMS = int(os.environ.get('SALES_BULK_MAX_ITEMS', '5000'))
+
+# Request profiling (src.profiling). Server-Timing headers with each response's
+# DB and render time; on by default only with DEBUG, since they reveal internals.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', str(DEBUG)).lower() == 'true'
+# Bearer token /metrics requires, when set; nginx does not route it either way
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Fraction of requests run under cProfile; profiles of requests slower than
+# PROFILE_SLOW_MS are saved to PROFILE_DIR (open them with pstats or snakeviz)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '500'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -42,6 +66,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -52,6 +77,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware too
+    'src.profiling.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,6 +107,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
@@ -91,11 +119,78 @@ DATABASES = {
         'NAME': os.environ.get('POSTGRES_DB', ''),
         'USER': os.environ.get('POSTGRES_USER', ''),
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
-        'HOST': 'db' if production_env else 'localhost',
+        'HOST': os.environ.get('POSTGRES_HOST', 'db' if production_env else 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'OPTIONS': {},
     }
 }
 
+# Connection reuse, one of:
+# - 'persistent' (default): each thread keeps its connection for DB_CONN_MAX_AGE
+#   seconds, checked before reuse. Under ASGI requests don't share a thread, so
+#   this falls back to a connection per request; use 'pool' there.
+# - 'pool': psycopg 3's connection pool, DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE
+#   connections per process, waiting up to DB_POOL_TIMEOUT seconds for one.
+#   Size it so that processes x DB_POOL_MAX_SIZE stays under max_connections.
+# - 'pgbouncer': for a PgBouncer in transaction mode at POSTGRES_HOST; connections
+#   persist as above, without server-side cursors. Django's client-side parameter
+#   binding already avoids prepared statements.
+# - 'off': a new connection per request.
+DB_CONNECTIONS = os.environ.get('DB_CONNECTIONS', 'persistent')
+
+if DB_CONNECTIONS == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+elif DB_CONNECTIONS in ('persistent', 'pgbouncer') and SERVER_MODE != 'asgi':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+# Reused connections are checked before use (for the pool, as they are handed out)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONNECTIONS != 'off'
+
+if DB_CONNECTIONS == 'pgbouncer':
+    # Transaction pooling hands each transaction a different server connection
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Cache
+# Local memory by default; set REDIS_URL to share the cache between workers.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300'))
+# Revocation flags for deactivated and deleted users, and cached User rows.
+# Every worker must see them and none may be evicted, or a revoked access token
+# works again: point USER_CACHE_REDIS_URL at a Redis with maxmemory-policy
+# noeviction. Without one, stateless auth checks is_active in the database.
+USER_CACHE_REDIS_URL = os.environ.get('USER_CACHE_REDIS_URL', '')
+if USER_CACHE_REDIS_URL:
+    CACHES['users'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': USER_CACHE_REDIS_URL,
+    }
+    USER_CACHE_ALIAS = 'users'
+else:
+    USER_CACHE_ALIAS = None
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', '60'))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -116,6 +211,27 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'src.User'
 
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new passwords. The others stay listed so
+# existing hashes still verify and are re-encoded with it on the next login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+_PASSWORD_HASHERS = {
+    'argon2': 'src.hashers.TunableArgon2PasswordHasher',
+    'scrypt': 'src.hashers.TunableScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Argon2id defaults follow the OWASP minimum (19 MiB, 2 passes, 1 lane)
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', '2'))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', '19456'))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', '1'))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', str(2 ** 14)))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', '8'))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', '1'))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -136,11 +252,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files (Uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media' # Or os.path.join(BASE_DIR, 'media') if not using pathlib
+# Internal nginx location serving MEDIA_ROOT; when set, Django answers cover
+# requests with X-Accel-Redirect instead of streaming the file itself
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+# Threads resizing uploaded covers per process; 0 resizes inline after commit
+COVER_IMAGE_WORKERS = int(os.environ.get('COVER_IMAGE_WORKERS', '2'))
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'src.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -190,13 +311,22 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 
     'TOKEN_OBTAIN_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenObtainPairSerializer',
-    'TOKEN_REFRESH_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenRefreshSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'src.serializers.CachedBlacklistTokenRefreshSerializer',
     'TOKEN_VERIFY_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenVerifySerializer',
     'TOKEN_BLACKLIST_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenBlacklistSerializer',
     'SLIDING_TOKEN_OBTAIN_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer',
     'SLIDING_TOKEN_REFRESH_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer',
 }
 
+# Bloom filter in front of the refresh token blacklist: 'redis' (shared by all
+# workers), 'local' (single process only) or empty to query the table directly.
+JWT_BLACKLIST_CACHE_ALIAS = 'default'
+JWT_BLACKLIST_BLOOM_BACKEND = os.environ.get(
+    'JWT_BLACKLIST_BLOOM_BACKEND', 'redis' if REDIS_URL else ''
+)
+JWT_BLACKLIST_BLOOM_CAPACITY = int(os.environ.get('JWT_BLACKLIST_BLOOM_CAPACITY', '1000000'))
+JWT_BLACKLIST_BLOOM_ERROR_RATE = float(os.environ.get('JWT_BLACKLIST_BLOOM_ERROR_RATE', '0.001'))
+
 # CORS settings for Next.js frontend
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Next.js development server
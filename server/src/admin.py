@@ -1,5 +1,25 @@
 from django.contrib import admin
-from src.models import Product, Sale
+from django.db import transaction
+from src.models import Product, Sale, StockMovement
+from src.services import StockService
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        """Route stock edits through the ledger, like the API does"""
+        stock = obj.stock
+        with transaction.atomic():
+            if not change:
+                obj.stock = 0
+                super().save_model(request, obj, form, change)
+                kind = StockMovement.Kind.RESTOCK
+            else:
+                fields = [field for field in form.changed_data if field != 'stock']
+                if fields:
+                    obj.save(update_fields=[*fields, 'updated_at'])
+                kind = StockMovement.Kind.ADJUSTMENT
+            if not change or 'stock' in form.changed_data:
+                StockService.set_stock(obj.pk, stock, kind)
+                obj.refresh_from_db(fields=['stock', 'updated_at'])
 
-admin.site.register(Product)
 admin.site.register(Sale)
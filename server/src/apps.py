@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class SrcConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src'
+
+    def ready(self):
+        # profiling counts queries on each connection from its first connect
+        from . import profiling, signals  # noqa: F401
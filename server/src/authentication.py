@@ -0,0 +1,90 @@
+import time
+from typing import Optional
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from .models import User
+
+def user_cache() -> Optional[BaseCache]:
+    """The shared cache for revocations and users, or None when there is none"""
+    alias = settings.USER_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+def _user_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+def _revoked_key(user_id) -> str:
+    return f'auth:revoked:{user_id}'
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that builds request.user from the verified claims.
+
+    With a USER_CACHE_ALIAS, no query is made per request; the only state
+    consulted is a revoked-at time, set when a user is deactivated, deleted
+    or loses staff or superuser rights. Tokens issued before it no longer
+    vouch for the user: the row is read instead, so a deactivated or deleted
+    user is rejected and a demoted one keeps only the rights they still have.
+    Without a cache, a time set by one worker would not reach the others, so
+    the row's is_active and privileges are read from the database instead.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        cache = user_cache()
+        if cache is None:
+            row = User.objects.filter(pk=user.id).values(
+                'is_active', 'is_staff', 'is_superuser'
+            ).first()
+            stale = row is None or (row['is_staff'], row['is_superuser']) != (
+                user.is_staff, user.is_superuser
+            )
+            if row is not None and not row['is_active']:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        else:
+            revoked_at = cache.get(_revoked_key(user.id))
+            stale = revoked_at is not None and validated_token.get('iat', 0) < revoked_at
+        if not stale:
+            return user
+        current = load_user(user.id)
+        if not current.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return current
+
+def load_user(user_id) -> User:
+    """The User row behind a token; a deleted user fails authentication"""
+    try:
+        return User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+def get_cached_user(user_id) -> User:
+    """Full User row for endpoints that need the model, cached for a short TTL"""
+    cache = user_cache()
+    if cache is None:
+        return load_user(user_id)
+    user = cache.get(_user_key(user_id))
+    if user is None:
+        user = load_user(user_id)
+        cache.set(_user_key(user_id), user, timeout=settings.USER_CACHE_TIMEOUT)
+    return user
+
+def get_request_user(request) -> User:
+    if isinstance(request.user, TokenUser):
+        return get_cached_user(request.user.id)
+    return request.user
+
+def invalidate_user(user: User, revoke: bool = False) -> None:
+    """Drop the cached row; with ``revoke``, stop trusting tokens issued until now"""
+    cache = user_cache()
+    if cache is None:
+        return
+    cache.delete(_user_key(user.pk))
+    if revoke:
+        # Access tokens issued before now expire within their lifetime
+        cache.set(
+            _revoked_key(user.pk), time.time(),
+            timeout=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()),
+        )
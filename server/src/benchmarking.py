@@ -0,0 +1,44 @@
+import json
+import math
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple, TypeVar
+from django.core.management.base import CommandError
+
+Result = TypeVar('Result')
+
+def run_requests(
+    request: Callable[[int], Result], total: int, concurrency: int
+) -> Tuple[List[Result], float]:
+    """Call ``request`` ``total`` times, ``concurrency`` at a time.
+
+    Returns the results in order and the seconds the whole run took. With a
+    concurrency of 1 the calls run in the calling thread, so in-process
+    requests see its database connection.
+    """
+    started = time.perf_counter()
+    if concurrency <= 1:
+        results = [request(i) for i in range(total)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+    return results, time.perf_counter() - started
+
+def percentile(latencies: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of sorted latencies: the smallest with p% at or below it"""
+    return latencies[max(0, math.ceil(len(latencies) * p / 100) - 1)]
+
+def login(base_url: str, username: str, password: str) -> str:
+    """Access token for a running server, for commands that load test over HTTP"""
+    request = urllib.request.Request(
+        f'{base_url}/auth/login/',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)['access']
+    except (urllib.error.URLError, KeyError) as exc:
+        raise CommandError(f'Could not log in to {base_url}: {exc}')
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+def get_catalog_version() -> int:
+    cache = catalog_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed with a timestamp so an evicted counter never reuses an old version
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+def bump_catalog_version() -> None:
+    cache = catalog_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+def bump_catalog_version_on_commit() -> None:
+    transaction.on_commit(bump_catalog_version)
+
+def _catalog_etag(version: int, request) -> str:
+    digest = hashlib.sha1(f'{version}:{request.get_full_path()}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+def _response_key(etag: str) -> str:
+    return 'catalog:response:' + etag.strip('"')
+
+def _not_modified(request, etag: str) -> bool:
+    return etag in request.headers.get('If-None-Match', '')
+
+def _cached_response(request):
+    """ETag for the request under the current catalog version, and its cached data"""
+    etag = _catalog_etag(get_catalog_version(), request)
+    if _not_modified(request, etag):
+        return etag, None
+    return etag, catalog_cache().get(_response_key(etag))
+
+class CatalogCacheMixin:
+    """Cache GET responses of catalog views under the current catalog version.
+
+    The version is part of both the cache key and the ETag, so any product
+    write invalidates every cached page at once, and a matching
+    ``If-None-Match`` is answered with 304 before the view touches the DB.
+    """
+
+    def get(self, request, *args, **kwargs):
+        etag, data = _cached_response(request)
+        if _not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if data is not None:
+            return Response(data, headers={'ETag': etag})
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            catalog_cache().set(
+                _response_key(etag), response.data, timeout=settings.CATALOG_CACHE_TIMEOUT
+            )
+            response['ETag'] = etag
+        return response
+
+class AsyncCatalogCacheMixin:
+    """CatalogCacheMixin for async views; the cache lookups share one thread hop"""
+
+    async def get(self, request, *args, **kwargs):
+        etag, data = await sync_to_async(_cached_response)(request)
+        if _not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if data is not None:
+            return Response(data, headers={'ETag': etag})
+
+        response = await super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await catalog_cache().aset(
+                _response_key(etag), response.data, timeout=settings.CATALOG_CACHE_TIMEOUT
+            )
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,200 @@
+import calendar
+import math
+import os
+import random
+import uuid
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import django
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from faker import Faker
+from .models import Product, Sale, SaleItem, StockMovement, User
+
+CATEGORIES = [
+    'Laptop', 'Desktop', 'Monitor', 'Keyboard', 'Mouse',
+    'Headphones', 'Speaker', 'Webcam', 'Microphone', 'Storage',
+]
+# Relative sales per calendar month: a January dip, back to school, Black Friday and Christmas
+MONTH_WEIGHTS = (0.8, 0.75, 0.9, 0.9, 1.0, 0.95, 0.95, 1.05, 1.0, 1.05, 1.45, 1.7)
+# Monday first; weekends sell more
+WEEKDAY_WEIGHTS = (0.9, 0.9, 0.95, 1.0, 1.15, 1.3, 1.1)
+# Local hours: quiet nights, a lunch bump and an evening peak
+HOUR_WEIGHTS = (
+    0.3, 0.15, 0.1, 0.1, 0.1, 0.15, 0.3, 0.6, 0.9, 1.0, 1.1, 1.3,
+    1.5, 1.3, 1.1, 1.1, 1.2, 1.4, 1.7, 2.0, 2.1, 1.8, 1.2, 0.6,
+)
+# Yearly growth, so recent months sell a little more than a year ago
+YEARLY_GROWTH = 0.15
+# Each extra item in a basket is this much less likely than the one before
+ITEM_COUNT_DECAY = 0.55
+QUANTITY_WEIGHTS = (0.62, 0.2, 0.1, 0.05, 0.03)
+
+USER_COLUMNS = (
+    'id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+    'email', 'is_staff', 'is_active', 'date_joined',
+)
+PRODUCT_COLUMNS = (
+    'id', 'name', 'description', 'price', 'sku', 'stock',
+    'created_at', 'updated_at', 'is_active', 'cover_variants',
+)
+SALE_COLUMNS = ('id', 'user_id', 'sale_date', 'total_amount')
+SALE_ITEM_COLUMNS = ('sale_id', 'product_id', 'quantity', 'unit_price')
+STOCK_MOVEMENT_COLUMNS = ('product_id', 'quantity', 'kind', 'created_at')
+
+# What generate_sales draws from, set in each worker by init_dataset_worker
+_sales_plan: Optional['SalesPlan'] = None
+
+def months_before(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(index, 12)
+    return day.replace(year=year, month=month + 1, day=min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+def chunk_random(seed: int, table: str, chunk: int) -> random.Random:
+    # One stream per chunk, so the rows don't depend on which worker makes them
+    return random.Random(f'{seed}:{table}:{chunk}')
+
+def random_uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def pick(rng: random.Random, cum_weights: Sequence[float]) -> int:
+    """Index drawn with the given cumulative weights, like random.choices"""
+    return bisect(cum_weights, rng.random() * cum_weights[-1], 0, len(cum_weights) - 1)
+
+def copy_rows(model, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """Stream rows into the model's table with COPY; columns are field attnames"""
+    column_names = {field.attname: field.column for field in model._meta.concrete_fields}
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = ', '.join(quote(column_names[column]) for column in columns)
+    with connection.cursor() as cursor:
+        with cursor.copy(f'COPY {table} ({names}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+
+class SalesPlan:
+    """The users, products and days sales are drawn from, with their weights"""
+
+    def __init__(
+        self, seed: int, user_ids: List[Any], products: List[Tuple[Any, Decimal]],
+        start: date, end: date, skew: float, max_items: int,
+    ):
+        self.seed = seed
+        self.user_ids = user_ids
+        # Popularity ranks are shuffled, so best sellers aren't simply the oldest products
+        self.products = list(products)
+        random.Random(f'{seed}:popularity').shuffle(self.products)
+        self.product_weights = list(accumulate(1 / rank ** skew for rank in range(1, len(products) + 1)))
+        self.days = [start + timedelta(days=offset) for offset in range((end - start).days)]
+        self.day_weights = list(accumulate(
+            MONTH_WEIGHTS[day.month - 1] * WEEKDAY_WEIGHTS[day.weekday()]
+            * (1 + YEARLY_GROWTH) ** ((day - end).days / 365)
+            for day in self.days
+        ))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+        self.max_items = min(max_items, len(products))
+        self.item_count_weights = list(accumulate(ITEM_COUNT_DECAY ** n for n in range(self.max_items)))
+        self.quantity_weights = list(accumulate(QUANTITY_WEIGHTS))
+
+def init_dataset_worker(settings_module: str, plan: Optional[SalesPlan]) -> None:
+    global _sales_plan
+    # A no-op for forked workers; spawned ones need the settings loaded
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    _sales_plan = plan
+
+def dataset_pool(workers: int, plan: Optional[SalesPlan] = None) -> ProcessPoolExecutor:
+    """Process pool for the generate_* functions; the parent's connections are closed first"""
+    # Forked workers must not share the parent's sockets, pooled ones included
+    connections.close_all()
+    for conn in connections.all():
+        if conn.vendor == 'postgresql':
+            conn.close_pool()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_dataset_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'), plan),
+    )
+
+def _moment(rng: random.Random, start: date, end: date) -> datetime:
+    day = start + timedelta(days=rng.randrange((end - start).days))
+    return timezone.make_aware(datetime.combine(day, time(rng.randrange(24), rng.randrange(60), rng.randrange(60))))
+
+def generate_users(
+    seed: int, chunk: int, first: int, count: int, password_hash: str, start: date, end: date
+) -> List[Any]:
+    """Insert users first to first + count - 1, sharing one password hash; returns their ids"""
+    rng = chunk_random(seed, 'users', chunk)
+    fake = Faker()
+    fake.seed_instance(rng.getrandbits(64))
+    rows = []
+    for n in range(first, first + count):
+        # Seed and number keep usernames unique across runs
+        username = f'{fake.user_name()}.{seed}.{n}'
+        rows.append((
+            random_uuid(rng), password_hash, False, username, fake.first_name(), fake.last_name(),
+            f'{username}@{fake.free_email_domain()}', False, True, _moment(rng, start, end),
+        ))
+    with transaction.atomic():
+        copy_rows(User, USER_COLUMNS, rows)
+    return [row[0] for row in rows]
+
+def generate_products(
+    seed: int, chunk: int, first: int, count: int, start: date, end: date
+) -> List[Tuple[Any, Decimal]]:
+    """Insert products first to first + count - 1; returns their ids and prices"""
+    rng = chunk_random(seed, 'products', chunk)
+    fake = Faker()
+    fake.seed_instance(rng.getrandbits(64))
+    rows = []
+    low, high = math.log(10), math.log(2000)
+    for n in range(first, first + count):
+        category = rng.choice(CATEGORIES)
+        # Log-uniform, so cheap accessories outnumber expensive machines
+        price = Decimal(math.exp(rng.uniform(low, high))).quantize(Decimal('0.01'))
+        created_at = _moment(rng, start, end)
+        rows.append((
+            random_uuid(rng), f'{fake.company()} {category} {fake.word().title()}',
+            fake.paragraph(nb_sentences=3), price, f'{category[:3].upper()}-{seed}-{n:07d}',
+            rng.randint(0, 200), created_at, created_at, rng.random() < 0.9, '{}',
+        ))
+    with transaction.atomic():
+        copy_rows(Product, PRODUCT_COLUMNS, rows)
+        # Each product's stock arrives as one restock, so the ledger adds up
+        copy_rows(StockMovement, STOCK_MOVEMENT_COLUMNS, (
+            (row[0], row[5], StockMovement.Kind.RESTOCK.value, row[6]) for row in rows if row[5]
+        ))
+    return [(row[0], row[3]) for row in rows]
+
+def generate_sales(chunk: int, count: int, plan: Optional[SalesPlan] = None) -> Tuple[int, int]:
+    """Insert count sales with their items and totals; returns the sale and item counts"""
+    plan = plan or _sales_plan
+    rng = chunk_random(plan.seed, 'sales', chunk)
+    sales, items = [], []
+    for _ in range(count):
+        sale_id = random_uuid(rng)
+        day = plan.days[pick(rng, plan.day_weights)]
+        sale_date = timezone.make_aware(
+            datetime.combine(day, time(pick(rng, plan.hour_weights), rng.randrange(60), rng.randrange(60)))
+        )
+        item_count = pick(rng, plan.item_count_weights) + 1
+        chosen: Dict[int, None] = {}
+        while len(chosen) < item_count:
+            chosen[pick(rng, plan.product_weights)] = None
+
+        total = Decimal('0')
+        for index in chosen:
+            product_id, unit_price = plan.products[index]
+            quantity = pick(rng, plan.quantity_weights) + 1
+            total += quantity * unit_price
+            items.append((sale_id, product_id, quantity, unit_price))
+        sales.append((sale_id, rng.choice(plan.user_ids), sale_date, total))
+
+    with transaction.atomic():
+        copy_rows(Sale, SALE_COLUMNS, sales)
+        copy_rows(SaleItem, SALE_ITEM_COLUMNS, items)
+    return len(sales), len(items)
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, ScryptPasswordHasher, make_password,
+)
+
+# Passwords sent to a worker per task: big enough to amortise pickling,
+# small enough to keep every core busy on a 1000-row batch
+HASH_CHUNK_SIZE = 32
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with its cost taken from settings.
+
+    Hashes made with other parameters still verify, and Django re-encodes them
+    with the current ones the next time the user logs in.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with its cost taken from settings (see TunableArgon2PasswordHasher)."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    @property
+    def maxmem(self):
+        # scrypt needs 128 * n * r bytes; OpenSSL's 32MB default rejects n >= 2**15
+        return 256 * self.work_factor * self.block_size
+
+def _init_hash_worker(settings_module: str) -> None:
+    # A no-op for forked workers; spawned ones need the settings loaded
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+def password_hashing_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for hash_passwords; hashing is CPU bound, so threads won't do."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_hash_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),),
+    )
+
+def hash_passwords(
+    passwords: List[str], pool: Optional[ProcessPoolExecutor] = None
+) -> List[str]:
+    """Hash passwords with the preferred hasher, in the pool when one is given."""
+    if pool is None or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+
+    return list(pool.map(make_password, passwords, chunksize=HASH_CHUNK_SIZE))
@@ -0,0 +1,125 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.http import FileResponse, HttpResponse
+from PIL import Image, ImageOps
+from .cache import bump_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes, largest first so each variant is resized from the previous one
+COVER_SIZES = {
+    'detail': (1200, 1200),
+    'thumb': (320, 320),
+}
+COVER_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def cover_executor() -> ThreadPoolExecutor:
+    # Pillow releases the GIL while decoding, resizing and encoding, so threads suffice
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.COVER_IMAGE_WORKERS, thread_name_prefix='cover-images'
+        )
+    return _executor
+
+def variants_are_stale(product: Product) -> bool:
+    """Whether cover_variants were made from another image than cover_image"""
+    if not product.cover_image:
+        return bool(product.cover_variants)
+    if not product.cover_variants:
+        return True
+    prefix = os.path.splitext(product.cover_image.name)[0] + '/'
+    return any(
+        not path.startswith(prefix)
+        for formats in product.cover_variants.values() for path in formats.values()
+    )
+
+def schedule_cover_variants(product_id) -> None:
+    """Generate the variants once the current transaction commits.
+
+    They are made in the worker pool, or inline when COVER_IMAGE_WORKERS is 0.
+    """
+    def submit():
+        if settings.COVER_IMAGE_WORKERS:
+            cover_executor().submit(_generate_in_worker, product_id)
+        else:
+            generate_cover_variants(product_id)
+
+    transaction.on_commit(submit)
+
+def _generate_in_worker(product_id) -> None:
+    close_old_connections()
+    try:
+        generate_cover_variants(product_id)
+    except Exception:
+        logger.exception('Could not generate cover variants for product %s', product_id)
+    finally:
+        close_old_connections()
+
+def generate_cover_variants(product_id) -> Dict[str, Dict[str, str]]:
+    """Resize a product's cover into every size and format and record the paths.
+
+    Variant names derive from the content-hashed cover name, so an existing
+    file already holds the right image and is not written again.
+    """
+    product = Product.objects.filter(pk=product_id).only('cover_image').first()
+    if product is None or not product.cover_image:
+        Product.objects.filter(pk=product_id).update(cover_variants={})
+        return {}
+
+    name = product.cover_image.name
+    base = os.path.splitext(name)[0]
+    variants: Dict[str, Dict[str, str]] = {}
+    with product.cover_image.open('rb') as upload, Image.open(upload) as image:
+        # Let the JPEG decoder downscale while reading when the source is huge
+        image.draft('RGB', COVER_SIZES['detail'])
+        resized = ImageOps.exif_transpose(image)
+        for size_name, box in COVER_SIZES.items():
+            resized = resized.copy()
+            resized.thumbnail(box, Image.Resampling.LANCZOS)
+            variants[size_name] = {
+                extension: _save_variant(resized, f'{base}/{size_name}.{extension}', extension)
+                for extension in COVER_FORMATS
+            }
+
+    updated = Product.objects.filter(pk=product_id, cover_image=name).update(
+        cover_variants=variants
+    )
+    if updated:
+        bump_catalog_version()
+    return variants
+
+def _save_variant(image: Image.Image, path: str, extension: str) -> str:
+    if default_storage.exists(path):
+        return path
+    image_format, options = COVER_FORMATS[extension]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+def media_response(path: str, content_type: str):
+    """Hand a media file to nginx with X-Accel-Redirect, or serve it without nginx"""
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT + quote(path)
+    else:
+        response = FileResponse(default_storage.open(path, 'rb'), content_type=content_type)
+    return response
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from src.services import SaleService
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored total of every sale from its line items, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of sales updated per transaction'
+        )
+
+    def handle(self, *args, **kwargs):
+        processed = 0
+        for processed in SaleService.recompute_totals(chunk_size=kwargs['chunk_size']):
+            self.stdout.write(f'Processed {processed} sales')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nSuccessfully recomputed totals for {processed} sales')
+        )
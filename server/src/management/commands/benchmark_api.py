@@ -0,0 +1,272 @@
+import json
+import re
+import statistics
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+from io import StringIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from src.benchmarking import percentile, run_requests
+from src.models import Product, StockMovement
+from src.services import StockService
+
+# The fixed dataset every run measures, at --scale 1
+DATASET = {'users': 200, 'products': 2000, 'sales': 20000}
+DATASET_SEED = 2024
+DATASET_END = date(2025, 1, 1)
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+# (name, method, path, body); 'sale' stands for a sale of three dataset products
+SCENARIOS = [
+    ('login', 'POST', '/auth/login/', {'username': 'admin', 'password': 'admin'}),
+    ('product-list', 'GET', '/products/', None),
+    ('product-search', 'GET', '/products/search/?q=laptop', None),
+    ('sale-create', 'POST', '/sales/', 'sale'),
+    ('sale-list', 'GET', '/sales/', None),
+    ('sale-analytics', 'GET', '/analytics/sales/?start=2024-07-01', None),
+    ('product-analytics', 'GET', '/analytics/products/?start=2024-07-01', None),
+]
+
+# status, queries (from Server-Timing) and seconds of one request
+Result = Tuple[int, Optional[int], float]
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the main API endpoints (login, product list and search, sale create and '
+        'list, analytics) on a fixed dataset, reporting requests/s, p50/p95/p99 latency and '
+        'queries per request, and compares them with a baseline. Fails when an endpoint makes '
+        'more queries than the baseline, or its throughput or p50 regresses beyond --tolerance. '
+        'Runs in-process against a throwaway test database, or against a server with --url '
+        '(which needs SERVER_TIMING=True for query counts and shares this database). '
+        'Latency baselines are machine specific: save one per machine with --save-baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            type=str,
+            default=None,
+            help='Base URL of a running server, e.g. http://127.0.0.1:8000 (default: in-process)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per endpoint, after one warm-up request'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of clients requesting at once'
+        )
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1.0,
+            help='Dataset size relative to the standard one; baselines only compare at the same scale'
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=str(DEFAULT_BASELINE),
+            help='Baseline JSON to compare with or save to'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Write the results to --baseline instead of comparing'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed relative drop in requests/s or rise in p50 (default: 0.25)'
+        )
+        parser.add_argument(
+            '--queries-only',
+            action='store_true',
+            help='Only gate on query counts, e.g. on hardware unlike the baseline\'s'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the in-process test database, so the next run skips seeding'
+        )
+        parser.add_argument(
+            '--current-db',
+            action='store_true',
+            help='Run in-process against the configured database instead of a test database'
+        )
+
+    def handle(self, *args, **kwargs):
+        dataset = {name: max(1, round(size * kwargs['scale'])) for name, size in DATASET.items()}
+        in_process = kwargs['url'] is None
+        old_name = None
+        if in_process and not kwargs['current_db']:
+            # Named apart from the test runner's, so --keepdb survives test runs
+            connection.settings_dict['TEST']['NAME'] = f'benchmark_{connection.settings_dict["NAME"]}'
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=kwargs['keepdb']
+            )
+        try:
+            product_ids = self._seed(dataset)
+            with override_settings(SERVER_TIMING=True, ALLOWED_HOSTS=['testserver']):
+                results = self._run_scenarios(kwargs, product_ids)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=kwargs['keepdb'])
+
+        report = {'dataset': dataset, 'endpoints': results}
+        if kwargs['save_baseline']:
+            with open(kwargs['baseline'], 'w') as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+                baseline_file.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'\nSuccessfully saved the baseline to {kwargs["baseline"]}'))
+            return
+        self._compare(report, kwargs)
+
+    def _seed(self, dataset: Dict[str, int]) -> List[str]:
+        """Generate the dataset unless it is there; returns the products sales are made of"""
+        products = Product.objects.filter(sku__contains=f'-{DATASET_SEED}-')
+        if products.count() != dataset['products']:
+            if products.exists():
+                raise CommandError(
+                    f'The database holds a benchmark dataset of another size than {dataset}; '
+                    'use another --scale or a fresh database.'
+                )
+            self.stdout.write(f'Generating the dataset: {dataset}')
+            call_command(
+                'generate_dataset', seed=DATASET_SEED, end=DATASET_END, months=12, workers=1,
+                batch_size=5000, password='admin', stdout=StringIO(), **dataset,
+            )
+            # Enough stock that the sale-create scenario never runs out
+            StockService.apply([
+                StockMovement(product_id=pk, quantity=10 ** 9, kind=StockMovement.Kind.RESTOCK)
+                for pk in products.values_list('id', flat=True)
+            ])
+        return [str(pk) for pk in products.order_by('sku').values_list('id', flat=True)[:3]]
+
+    def _run_scenarios(self, kwargs, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        send = self._http_sender(kwargs['url'].rstrip('/')) if kwargs['url'] else self._client_sender()
+        status, _, _, content = send('POST', '/auth/login/', {'username': 'admin', 'password': 'admin'}, None)
+        if status != 200:
+            raise CommandError(f'Could not log in as admin (status {status}).')
+        token = json.loads(content)['access']
+
+        self.stdout.write(
+            f'{"endpoint":<18} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"errors":>7}'
+        )
+        results = {}
+        for name, method, path, body in SCENARIOS:
+            if body == 'sale':
+                body = {'items': [{'product_id': pk, 'quantity': 1} for pk in product_ids]}
+            auth = None if name == 'login' else token
+
+            def request(_):
+                return send(method, path, body, auth)[:3]
+
+            request(None)
+            results[name] = stats = self._measure(request, kwargs['requests'], kwargs['concurrency'])
+            self.stdout.write(
+                f'{name:<18} {stats["rps"]:>8.1f} {stats["p50_ms"]:>8.1f} {stats["p95_ms"]:>8.1f} '
+                f'{stats["p99_ms"]:>8.1f} {stats["queries"] if stats["queries"] is not None else "-":>8} '
+                f'{stats["errors"]:>7}'
+            )
+        return results
+
+    @staticmethod
+    def _measure(request: Callable[[Any], Result], total: int, concurrency: int) -> Dict[str, Any]:
+        results, elapsed = run_requests(request, total, concurrency)
+        latencies = sorted(seconds * 1000 for _, _, seconds in results)
+        queries = [count for _, count, _ in results if count is not None]
+
+        return {
+            'rps': round(total / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries': statistics.median_low(queries) if queries else None,
+            'errors': sum(1 for status, _, _ in results if status >= 400),
+        }
+
+    @staticmethod
+    def _client_sender():
+        def send(method, path, body, token):
+            headers = {'Authorization': f'Bearer {token}'} if token else {}
+            client = Client()
+            started = time.perf_counter()
+            if method == 'POST':
+                response = client.post(path, body, content_type='application/json', headers=headers)
+            else:
+                response = client.get(path, headers=headers)
+            elapsed = time.perf_counter() - started
+            return response.status_code, _queries(response.get('Server-Timing')), elapsed, response.content
+        return send
+
+    @staticmethod
+    def _http_sender(base_url: str):
+        def send(method, path, body, token):
+            headers = {'Content-Type': 'application/json'}
+            if token:
+                headers['Authorization'] = f'Bearer {token}'
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    content = response.read()
+                    status, timing = response.status, response.headers.get('Server-Timing')
+            except urllib.error.HTTPError as exc:
+                content, status, timing = exc.read(), exc.code, exc.headers.get('Server-Timing')
+            except (urllib.error.URLError, OSError) as exc:
+                raise CommandError(f'Could not reach {base_url}: {exc}')
+            return status, _queries(timing), time.perf_counter() - started, content
+        return send
+
+    def _compare(self, report: Dict[str, Any], kwargs) -> None:
+        try:
+            with open(kwargs['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+        except FileNotFoundError:
+            raise CommandError(f'No baseline at {kwargs["baseline"]}; create one with --save-baseline.')
+        if baseline['dataset'] != report['dataset']:
+            raise CommandError(
+                f'The baseline was measured on {baseline["dataset"]}, not {report["dataset"]}.'
+            )
+
+        tolerance = kwargs['tolerance']
+        regressions = []
+        for name, stats in report['endpoints'].items():
+            if stats['errors']:
+                regressions.append(f'{name}: {stats["errors"]} requests failed')
+            expected = baseline['endpoints'].get(name)
+            if expected is None:
+                continue
+            if None not in (stats['queries'], expected['queries']) and stats['queries'] > expected['queries']:
+                regressions.append(f'{name}: {stats["queries"]} queries, baseline {expected["queries"]}')
+            if kwargs['queries_only']:
+                continue
+            if stats['rps'] < expected['rps'] * (1 - tolerance):
+                regressions.append(f'{name}: {stats["rps"]} req/s, baseline {expected["rps"]}')
+            # p95 and p99 are reported but too noisy over a few dozen requests to gate on
+            if stats['p50_ms'] > expected['p50_ms'] * (1 + tolerance):
+                regressions.append(f'{name}: p50 {stats["p50_ms"]} ms, baseline {expected["p50_ms"]}')
+
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f'{len(regressions)} regressions against {kwargs["baseline"]}')
+        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully matched the baseline in {kwargs["baseline"]}'))
+
+def _queries(server_timing: Optional[str]) -> Optional[int]:
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
@@ -0,0 +1,91 @@
+import json
+import time
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from src.benchmarking import percentile, run_requests
+
+class Command(BaseCommand):
+    help = (
+        'Measures login throughput by posting credentials to the token endpoint '
+        'in-process, and the verify cost of each configured password hasher'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            default='admin',
+            help='Existing user to log in as (see generate_dataset)'
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            default='admin',
+            help='Password of that user'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Number of logins to perform'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of threads logging in at once'
+        )
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(f'Preferred hasher: {get_hasher().algorithm}')
+        for hasher in get_hashers():
+            self.stdout.write(f'  {hasher.algorithm:<16} {self._verify_ms(hasher):8.1f} ms per check')
+
+        factory = RequestFactory()
+        view = resolve(reverse('token-obtain-pair')).func
+        body = json.dumps({'username': kwargs['username'], 'password': kwargs['password']})
+
+        def login(_):
+            request = factory.post(
+                reverse('token-obtain-pair'), body, content_type='application/json'
+            )
+            started = time.perf_counter()
+            try:
+                response = view(request)
+            finally:
+                connection.close()
+            return response.status_code, time.perf_counter() - started
+
+        total = kwargs['requests']
+        results, elapsed = run_requests(login, total, kwargs['concurrency'])
+
+        failures = sum(1 for status, _ in results if status != 200)
+        if failures == total:
+            raise CommandError(
+                f'Every login failed; check --username and --password '
+                f'(status {results[0][0]}).'
+            )
+
+        latencies = sorted(latency * 1000 for _, latency in results)
+        self.stdout.write(
+            f'\n{total} logins, concurrency {kwargs["concurrency"]}: '
+            f'{total / elapsed:.1f} logins/s, '
+            f'p50 {percentile(latencies, 50):.1f} ms, '
+            f'p95 {percentile(latencies, 95):.1f} ms, '
+            f'{failures} failed'
+        )
+
+    @staticmethod
+    def _verify_ms(hasher, rounds: int = 5) -> float:
+        try:
+            encoded = hasher.encode('benchmark-password', hasher.salt())
+        except ValueError:
+            # The hasher's optional library is not installed
+            return float('nan')
+        started = time.perf_counter()
+        for _ in range(rounds):
+            hasher.verify('benchmark-password', encoded)
+        return (time.perf_counter() - started) * 1000 / rounds
@@ -0,0 +1,57 @@
+import csv
+import resource
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from src.services import ProductImportService
+
+class Command(BaseCommand):
+    help = (
+        'Measures product import throughput on a generated feed: one pass that inserts '
+        'every SKU and one that updates them. Everything is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Number of products in the generated feed'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows validated and upserted at a time'
+        )
+
+    def handle(self, *args, **kwargs):
+        total = kwargs['rows']
+        with tempfile.TemporaryFile('w+', newline='', encoding='utf-8') as feed:
+            writer = csv.writer(feed)
+            writer.writerow(['sku', 'name', 'description', 'price', 'stock', 'is_active'])
+            for i in range(total):
+                writer.writerow([
+                    f'BENCH-{i:08d}', f'Benchmark product {i}', 'Generated by benchmark_product_import',
+                    f'{10 + i % 990}.{i % 100:02d}', i % 500, 'true',
+                ])
+
+            with transaction.atomic():
+                for label in ('insert', 'update'):
+                    feed.seek(0)
+                    self._run(label, feed, total, kwargs['batch_size'])
+                transaction.set_rollback(True)
+
+    def _run(self, label, feed, total, batch_size):
+        started = time.perf_counter()
+        rows = ProductImportService.read_csv(feed)
+        upserted = 0
+        for _, upserted, _ in ProductImportService.import_products(rows, batch_size=batch_size):
+            pass
+        elapsed = time.perf_counter() - started
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f'{label:<7} {upserted} rows in {elapsed:.1f}s: {total / elapsed:,.0f} rows/s '
+            f'(peak RSS {peak_mb:.0f} MB)'
+        )
@@ -0,0 +1,101 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from src.models import Product, Sale, SaleItem, User
+from src.renderers import ORJSONRenderer
+from src.row_serializers import RowSerializer
+from src.serializers import ProductSerializer, SaleSerializer
+from src.services import SaleService
+
+class Command(BaseCommand):
+    help = (
+        'Compares ProductSerializer and SaleSerializer with DRF\'s JSON renderer against '
+        'their compiled RowSerializer with orjson on generated data, checking both produce '
+        'the same bytes. Everything is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=200,
+            help='Number of products serialized per round'
+        )
+        parser.add_argument(
+            '--sales',
+            type=int,
+            default=200,
+            help='Number of sales serialized per round'
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=5,
+            help='Items per sale'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Rounds per serializer, after one warm-up round'
+        )
+
+    def handle(self, *args, **kwargs):
+        request = RequestFactory().get('/')
+        context = {'request': request}
+        with transaction.atomic():
+            self._generate(kwargs['products'], kwargs['sales'], kwargs['items'])
+            products = Product.objects.filter(sku__startswith='BENCH-SER-').order_by('-created_at', '-id')
+            sales = Sale.objects.filter(user__username='benchmark-serialization').order_by('-sale_date', '-id')
+
+            self.stdout.write(f'{"serializer":<20} {"drf ms":>8} {"fast ms":>8} {"speedup":>8} {"bytes":>9}')
+            for label, serializer_class, queryset in (
+                ('ProductSerializer', ProductSerializer, products),
+                ('SaleSerializer', SaleSerializer, sales.with_details()),
+            ):
+                def drf():
+                    data = serializer_class(queryset.all(), many=True, context=context).data
+                    return JSONRenderer().render(data)
+
+                def fast():
+                    rows = RowSerializer(serializer_class(context=context))
+                    return ORJSONRenderer().render(rows.to_representation(rows.values(queryset.all())))
+
+                drf_ms, expected = self._time(drf, kwargs['rounds'])
+                fast_ms, output = self._time(fast, kwargs['rounds'])
+                if output != expected:
+                    raise CommandError(f'{label}: the fast path output differs from DRF\'s')
+                self.stdout.write(
+                    f'{label:<20} {drf_ms:>8.1f} {fast_ms:>8.1f} {drf_ms / fast_ms:>7.1f}x {len(output):>9}'
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _generate(product_count: int, sale_count: int, items_per_sale: int) -> None:
+        user = User.objects.create_user(username='benchmark-serialization', password=None)
+        products = [
+            Product.objects.create(
+                name=f'Benchmark product {i}', description='Generated by benchmark_serialization. ' * 20,
+                price=Decimal(f'{10 + i % 990}.{i % 100:02d}'), sku=f'BENCH-SER-{i:06d}', stock=10 ** 6,
+            )
+            for i in range(max(product_count, items_per_sale))
+        ]
+        SaleService.create_sales([
+            (Sale(user=user), [
+                SaleItem(product=product, quantity=1)
+                for product in random.sample(products, items_per_sale)
+            ])
+            for _ in range(sale_count)
+        ])
+
+    @staticmethod
+    def _time(render, rounds: int):
+        output = render()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            render()
+        return (time.perf_counter() - started) * 1000 / rounds, output
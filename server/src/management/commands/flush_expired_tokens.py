@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from src.tokens import blacklist_table_stats, get_bloom_filter
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding and blacklisted tokens in batches; meant to run on a schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of outstanding tokens deleted per statement'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+        now = timezone.now()
+        deleted = 0
+
+        while True:
+            pks = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            # The blacklist rows of these tokens are deleted along with them
+            OutstandingToken.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
+            self.stdout.write(f'Deleted {deleted} expired tokens')
+
+        bloom = get_bloom_filter()
+        if bloom is not None:
+            bloom.rebuild()
+            self.stdout.write('Rebuilt the blacklist Bloom filter')
+
+        stats = blacklist_table_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully flushed {deleted} expired tokens '
+            f'(~{stats["outstanding_tokens"]} outstanding, ~{stats["blacklisted_tokens"]} blacklisted left)'
+        ))
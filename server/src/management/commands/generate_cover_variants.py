@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from src.images import generate_cover_variants, variants_are_stale
+from src.models import Product
+
+class Command(BaseCommand):
+    help = (
+        'Generates missing or outdated cover variants, e.g. for covers uploaded before '
+        'variants existed or whose background job was lost on a restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of covers resized at once'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate every cover, not only stale ones'
+        )
+
+    def handle(self, *args, **kwargs):
+        products = Product.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+        pending = [
+            product.pk
+            for product in products.only('cover_image', 'cover_variants').iterator()
+            if kwargs['all'] or variants_are_stale(product)
+        ]
+
+        def generate(product_id):
+            try:
+                return generate_cover_variants(product_id)
+            finally:
+                close_old_connections()
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=kwargs['workers']) as pool:
+            for _ in pool.map(generate, pending):
+                done += 1
+                if done % 100 == 0:
+                    self.stdout.write(f'Generated variants for {done} of {len(pending)} products')
+
+        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully generated variants for {done} products'))
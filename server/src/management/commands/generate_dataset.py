@@ -0,0 +1,185 @@
+import os
+import random
+from datetime import date
+from functools import partial
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils import timezone
+from src.cache import bump_catalog_version
+from src.datasets import (
+    SalesPlan, dataset_pool, generate_products, generate_sales, generate_users, months_before,
+)
+from src.models import Product, User
+from src.services import SalesRollupService
+
+class Command(BaseCommand):
+    help = (
+        'Generates users, products and sales for load tests, streaming each batch into the '
+        'database with COPY. Product popularity follows a Zipf distribution and sale dates '
+        'follow seasonal, weekly and daily patterns. The same --seed, --batch-size and --end '
+        'generate the same rows whatever the number of workers. Also ensures an admin user exists.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of users to create; with 0, sales go to existing users'
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=100,
+            help='Number of products to create; with 0, sales use existing products'
+        )
+        parser.add_argument(
+            '--sales',
+            type=int,
+            default=1000,
+            help='Number of sales to create'
+        )
+        parser.add_argument(
+            '--max-items',
+            type=int,
+            default=5,
+            help='Most distinct products in a sale; smaller baskets are more likely'
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Zipf exponent of product popularity (0 for uniform)'
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Months of history before --end that sales are spread over'
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            default=None,
+            help='Day after the last generated sale, as YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed, for a reproducible dataset (default: random)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows generated and copied per batch, each in its own transaction'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes generating batches (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            default='admin',
+            help='Password for the admin user and the generated users'
+        )
+
+    def handle(self, *args, **kwargs):
+        seed = kwargs['seed'] if kwargs['seed'] is not None else random.randrange(10 ** 6)
+        batch_size = kwargs['batch_size']
+        if batch_size < 1 or kwargs['max_items'] < 1 or kwargs['months'] < 1:
+            raise CommandError('--batch-size, --max-items and --months must be at least 1.')
+        end = kwargs['end'] or timezone.localdate()
+        start = months_before(end, kwargs['months'])
+        self.stdout.write(f'Seed {seed}, sales from {start} to {end}')
+
+        self._ensure_admin(kwargs['password'])
+        workers = kwargs['workers']
+        password_hash = make_password(kwargs['password'])
+
+        user_ids = []
+        for ids in self._run(workers, None, [
+            partial(generate_users, seed, chunk, first, count, password_hash, start, end)
+            for chunk, first, count in self._chunks(kwargs['users'], batch_size)
+        ]):
+            user_ids.extend(ids)
+            self.stdout.write(f'Created {len(user_ids)} users')
+
+        products = []
+        for rows in self._run(workers, None, [
+            partial(generate_products, seed, chunk, first, count, start, end)
+            for chunk, first, count in self._chunks(kwargs['products'], batch_size)
+        ]):
+            products.extend(rows)
+            self.stdout.write(f'Created {len(products)} products')
+        if products:
+            bump_catalog_version()
+
+        if not kwargs['sales']:
+            self.stdout.write(self.style.SUCCESS('\nSuccessfully generated the dataset'))
+            return
+
+        if not user_ids:
+            user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        if not products:
+            products = list(Product.objects.order_by('id').values_list('id', 'price'))
+        if not products:
+            raise CommandError('No products found in the database; generate some with --products.')
+
+        plan = SalesPlan(
+            seed, user_ids, products, start, end, kwargs['skew'], kwargs['max_items']
+        )
+        sale_count = item_count = 0
+        for sales, items in self._run(workers, plan, [
+            partial(generate_sales, chunk, count)
+            for chunk, _, count in self._chunks(kwargs['sales'], batch_size)
+        ]):
+            sale_count += sales
+            item_count += items
+            self.stdout.write(f'Created {sale_count} sales ({item_count} items)')
+
+        SalesRollupService.rebuild(since=start)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSuccessfully generated {len(user_ids)} users, {len(products)} products '
+                f'and {sale_count} sales with {item_count} items'
+            )
+        )
+
+    def _ensure_admin(self, password: str) -> None:
+        try:
+            admin_user, created = User.objects.get_or_create(
+                username='admin',
+                defaults={'is_staff': True, 'is_superuser': True, 'email': 'admin@example.com'}
+            )
+            admin_user.set_password(password)
+            admin_user.save()
+            status = 'Created' if created else 'Updated'
+            self.stdout.write(self.style.SUCCESS(f'{status} admin user with password "{password}"'))
+        except IntegrityError:
+            self.stdout.write(self.style.WARNING('Admin user could not be created due to an integrity error (e.g., email conflict).'))
+
+    @staticmethod
+    def _chunks(total: int, batch_size: int):
+        return [
+            (chunk, first, min(batch_size, total - first))
+            for chunk, first in enumerate(range(0, total, batch_size))
+        ]
+
+    @staticmethod
+    def _run(workers: int, plan, tasks):
+        """Each task's result, in order; in a process pool unless there's one worker or task"""
+        if workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield task(plan=plan) if plan is not None else task()
+            return
+        with dataset_pool(workers, plan) as pool:
+            yield from pool.map(_call, tasks)
+
+def _call(task):
+    return task()
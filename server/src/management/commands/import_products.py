@@ -0,0 +1,65 @@
+import io
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from src.services import ProductImportService
+
+class Command(BaseCommand):
+    help = (
+        'Upserts products on SKU from a CSV or NDJSON feed with sku, name, price and '
+        'optionally description, stock and is_active, streaming it in batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='File to read, or - for standard input'
+        )
+        parser.add_argument(
+            '--format',
+            choices=ProductImportService.FORMATS,
+            help='Feed format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows validated and upserted at a time'
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        import_format = kwargs['format'] or ProductImportService.format_of(path)
+        if import_format is None:
+            raise CommandError('Could not tell the format from the file name; pass --format.')
+        try:
+            if path == '-':
+                source = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+            else:
+                source = open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(f'Could not open {path}: {exc}')
+
+        processed = upserted = rejected = 0
+        with source:
+            rows = ProductImportService.read(source, import_format)
+            try:
+                for processed, upserted, errors in ProductImportService.import_products(
+                    rows, batch_size=kwargs['batch_size']
+                ):
+                    for line, row_errors in errors:
+                        messages = '; '.join(
+                            f'{field}: {" ".join(field_errors)}'
+                            for field, field_errors in row_errors.items()
+                        )
+                        self.stderr.write(f'Line {line}: {messages}')
+                    rejected += len(errors)
+                    self.stdout.write(
+                        f'Processed {processed} rows ({upserted} upserted, {rejected} rejected)'
+                    )
+            except UnicodeDecodeError:
+                raise CommandError(f'{path} is not UTF-8 encoded.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully upserted {upserted} products from {processed} rows, {rejected} rejected'
+        ))
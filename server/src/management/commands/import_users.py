@@ -0,0 +1,62 @@
+import csv
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from src.services import UserImportService
+
+class Command(BaseCommand):
+    help = (
+        'Imports users from a CSV file with username, password, email, first_name and '
+        'last_name columns, hashing passwords in parallel and skipping existing usernames'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='CSV file to read, or - for standard input'
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            default=None,
+            help='Password for rows that do not have one (default: unusable password)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used to hash passwords (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users hashed and inserted at a time'
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'Could not open {path}: {exc}')
+
+        default_password = kwargs['password']
+        with source:
+            reader = csv.DictReader(source)
+            if 'username' not in (reader.fieldnames or []):
+                raise CommandError('The CSV file must have a username column.')
+            rows = (
+                {**row, 'password': row.get('password') or default_password}
+                for row in reader
+            )
+            created = skipped = 0
+            for created, skipped in UserImportService.import_users(
+                rows, workers=kwargs['workers'], batch_size=kwargs['batch_size']
+            ):
+                self.stdout.write(f'Imported {created} users ({skipped} skipped)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully imported {created} users, skipped {skipped}'
+        ))
@@ -0,0 +1,73 @@
+import time
+import urllib.error
+import urllib.request
+from django.core.management.base import BaseCommand
+from src.benchmarking import login, percentile, run_requests
+
+class Command(BaseCommand):
+    help = (
+        'Load tests running servers, e.g. the sync (SERVER_MODE=wsgi) and async '
+        '(SERVER_MODE=asgi) stacks side by side, and reports requests/s and latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_urls',
+            nargs='+',
+            type=str,
+            help='Server base URLs to compare, e.g. http://localhost:8000'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Endpoint to request, may be repeated (default: /products/ and /sales/)'
+        )
+        parser.add_argument('--username', type=str, default='admin')
+        parser.add_argument('--password', type=str, default='admin')
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Requests per endpoint and server'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Number of clients requesting at once'
+        )
+
+    def handle(self, *args, **kwargs):
+        paths = kwargs['paths'] or ['/products/', '/sales/']
+        self.stdout.write(
+            f'{"server":<28} {"path":<20} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}'
+        )
+        for base_url in kwargs['base_urls']:
+            base_url = base_url.rstrip('/')
+            token = login(base_url, kwargs['username'], kwargs['password'])
+            for path in paths:
+                rps, p50, p99, errors = self._run(
+                    base_url + path, token, kwargs['requests'], kwargs['concurrency']
+                )
+                self.stdout.write(
+                    f'{base_url:<28} {path:<20} {rps:>8.1f} {p50:>8.1f} {p99:>8.1f} {errors:>7}'
+                )
+
+    @staticmethod
+    def _run(url: str, token: str, total: int, concurrency: int):
+        def fetch(_):
+            request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return ok, (time.perf_counter() - started) * 1000
+
+        results, elapsed = run_requests(fetch, total, concurrency)
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for ok, _ in results if not ok)
+        return total / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
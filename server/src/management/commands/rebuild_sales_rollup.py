@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from src.services import SalesRollupService
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly sales rollup from the sale items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='Only rebuild months starting at this date (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **kwargs):
+        since = None
+        if kwargs['since']:
+            since = parse_date(kwargs['since'])
+            if since is None:
+                raise CommandError('--since must use the YYYY-MM-DD format')
+
+        SalesRollupService.rebuild(since=since)
+
+        scope = f'since {since:%Y-%m}' if since else 'for all months'
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the sales rollup {scope}'))
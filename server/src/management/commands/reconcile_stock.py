@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from src.services import StockService
+
+class Command(BaseCommand):
+    help = (
+        'Compares each product\'s stock with the sum of its stock movements and lists the '
+        'products that differ. With --fix, resets their stock to the ledger\'s sum.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted stock to the ledger (products whose ledger sums below zero are skipped)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Most drifted products to list'
+        )
+
+    def handle(self, *args, **kwargs):
+        drifted = StockService.drifted().order_by('sku')
+        count = drifted.count()
+        for sku, stock, ledger in drifted.values_list('sku', 'stock', 'ledger')[:kwargs['limit']]:
+            self.stdout.write(f'{sku}: stock {stock}, ledger {ledger} ({stock - ledger:+d})')
+        if count > kwargs['limit']:
+            self.stdout.write(f'... and {count - kwargs["limit"]} more')
+
+        if not kwargs['fix']:
+            self.stdout.write(self.style.SUCCESS(f'\nSuccessfully checked the stock: {count} products drifted'))
+            return
+        fixed = StockService.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully reset the stock of {fixed} products to the ledger'))
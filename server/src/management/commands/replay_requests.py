@@ -0,0 +1,217 @@
+import json
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.core.management.base import BaseCommand, CommandError
+from src.benchmarking import login, percentile
+
+ID_RE = re.compile(
+    r'/(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)(?=/|$)', re.IGNORECASE
+)
+SAFE_METHODS = ('GET', 'HEAD')
+
+def route_of(path: str) -> str:
+    """The path without its query string, with ids replaced, for grouping"""
+    return ID_RE.sub('/{id}', path.split('?', 1)[0])
+
+def parse_timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+class Command(BaseCommand):
+    help = (
+        'Replays a log of requests against a running server and reports latency per route. '
+        'The log holds one JSON object per line: "path" (required), "method" (default GET), '
+        '"body" (sent as JSON), "headers" and "ts" (seconds or an ISO 8601 timestamp, used '
+        'to keep the original pacing). Other lines are skipped. With --warm, each distinct '
+        'GET is requested once to prime response caches and worker database connections '
+        'after a deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Request log to replay, or - for standard input'
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            default='http://127.0.0.1:8000',
+            help='Base URL of the server'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Number of requests in flight at once'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Most requests started per second (default: no limit)'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=0,
+            help='Replay at this multiple of the logged pace, from "ts" (default: as fast as allowed)'
+        )
+        parser.add_argument(
+            '--token',
+            type=str,
+            default=None,
+            help='Bearer token sent with every request, replacing logged Authorization headers'
+        )
+        parser.add_argument(
+            '--username',
+            type=str,
+            default=None,
+            help='Log in as this user and send its token (with --password)'
+        )
+        parser.add_argument('--password', type=str, default=None)
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Only send each distinct GET/HEAD once, skipping writes'
+        )
+
+    def handle(self, *args, **kwargs):
+        base_url = kwargs['url'].rstrip('/')
+        token = kwargs['token']
+        if kwargs['username']:
+            token = login(base_url, kwargs['username'], kwargs['password'] or '')
+
+        path = kwargs['path']
+        try:
+            source = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'Could not open {path}: {exc}')
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        lock = threading.Lock()
+        # Bounds the lines read ahead of the requests in flight
+        in_flight = threading.BoundedSemaphore(kwargs['concurrency'] * 2)
+
+        def send(entry: dict) -> None:
+            try:
+                route = f'{entry["method"]} {route_of(entry["path"])}'
+                status, seconds = self._send(base_url, entry, token)
+                with lock:
+                    latencies[route].append(seconds * 1000)
+                    if status is None or status >= 400:
+                        errors[route] += 1
+            finally:
+                in_flight.release()
+
+        started = time.perf_counter()
+        with source, ThreadPoolExecutor(max_workers=kwargs['concurrency']) as pool:
+            entries, skipped = self._entries(source, kwargs['warm'])
+            sent = 0
+            for due, entry in self._schedule(entries, kwargs['rate'], kwargs['speed']):
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                in_flight.acquire()
+                pool.submit(send, entry)
+                sent += 1
+        elapsed = time.perf_counter() - started
+
+        self._report(latencies, errors)
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully replayed {sent} requests in {elapsed:.1f}s '
+            f'({sent / elapsed if elapsed else 0:.1f} req/s), {skipped[0]} lines skipped'
+        ))
+
+    @staticmethod
+    def _entries(source, warm: bool) -> Tuple[Iterator[dict], List[int]]:
+        """Valid log entries, read lazily; the skipped count fills in as they are read"""
+        skipped = [0]
+        seen = set()
+
+        def read():
+            for line in source:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    request_path = entry['path']
+                    if not isinstance(request_path, str) or not request_path.startswith('/'):
+                        raise ValueError(request_path)
+                    entry['method'] = str(entry.get('method', 'GET')).upper()
+                    entry['ts'] = parse_timestamp(entry.get('ts'))
+                except (ValueError, TypeError, KeyError):
+                    skipped[0] += 1
+                    continue
+                if warm:
+                    if entry['method'] not in SAFE_METHODS or request_path in seen:
+                        continue
+                    seen.add(request_path)
+                yield entry
+        return read(), skipped
+
+    @staticmethod
+    def _schedule(entries: Iterator[dict], rate: float, speed: float) -> Iterator[Tuple[float, dict]]:
+        """Each entry with the time it is due, in seconds from the start"""
+        first_ts = None
+        due = 0.0
+        for index, entry in enumerate(entries):
+            due = 0.0
+            if speed and entry['ts'] is not None:
+                first_ts = entry['ts'] if first_ts is None else first_ts
+                due = (entry['ts'] - first_ts) / speed
+            if rate:
+                due = max(due, index / rate)
+            yield due, entry
+
+    @staticmethod
+    def _send(base_url: str, entry: dict, token: Optional[str]) -> Tuple[Optional[int], float]:
+        headers = {
+            name: value for name, value in (entry.get('headers') or {}).items()
+            if name.lower() not in ('host', 'content-length')
+        }
+        data = None
+        if entry.get('body') is not None:
+            data = json.dumps(entry['body']).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers = {name: value for name, value in headers.items() if name.lower() != 'authorization'}
+            headers['Authorization'] = f'Bearer {token}'
+
+        request = urllib.request.Request(
+            base_url + entry['path'], data=data, headers=headers, method=entry['method']
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        except (urllib.error.URLError, OSError):
+            status = None
+        return status, time.perf_counter() - started
+
+    def _report(self, latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+        self.stdout.write(
+            f'{"route":<40} {"count":>7} {"errors":>7} {"p50 ms":>8} {"p90 ms":>8} '
+            f'{"p99 ms":>8} {"max ms":>8}'
+        )
+        for route in sorted(latencies, key=lambda route: -len(latencies[route])):
+            values = sorted(latencies[route])
+            self.stdout.write(
+                f'{route:<40} {len(values):>7} {errors[route]:>7} {percentile(values, 50):>8.1f} '
+                f'{percentile(values, 90):>8.1f} {percentile(values, 99):>8.1f} {values[-1]:>8.1f}'
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from src.tokens import blacklist_table_stats
+
+class Command(BaseCommand):
+    help = 'Reports the size of the outstanding and blacklisted token tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--exact',
+            action='store_true',
+            help='Also run COUNT(*) queries, including expired rows waiting for cleanup'
+        )
+
+    def handle(self, *args, **kwargs):
+        for name, estimate in blacklist_table_stats().items():
+            self.stdout.write(f'{name}: ~{estimate}')
+
+        if kwargs['exact']:
+            now = timezone.now()
+            self.stdout.write(f'outstanding_tokens (exact): {OutstandingToken.objects.count()}')
+            self.stdout.write(f'blacklisted_tokens (exact): {BlacklistedToken.objects.count()}')
+            self.stdout.write(
+                f'expired_tokens: {OutstandingToken.objects.filter(expires_at__lte=now).count()}'
+            )
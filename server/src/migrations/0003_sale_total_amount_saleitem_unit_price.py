@@ -0,0 +1,63 @@
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 1000
+
+def backfill_totals(apps, schema_editor):
+    Product = apps.get_model('src', 'Product')
+    Sale = apps.get_model('src', 'Sale')
+    SaleItem = apps.get_model('src', 'SaleItem')
+
+    product_price = Product.objects.filter(pk=models.OuterRef('product_id')).values('price')
+    item_totals = SaleItem.objects.filter(
+        sale=models.OuterRef('pk')
+    ).values('sale').annotate(
+        total=models.Sum(models.F('quantity') * models.F('unit_price'))
+    ).values('total')
+
+    last_pk = None
+    while True:
+        chunk = Sale.objects.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not pks:
+            break
+
+        SaleItem.objects.filter(sale_id__in=pks).update(
+            unit_price=models.Subquery(product_price)
+        )
+        Sale.objects.filter(pk__in=pks).update(
+            total_amount=Coalesce(
+                models.Subquery(item_totals), Decimal('0'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 01:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollup(apps, schema_editor):
+    """Roll up the existing sales, as SalesRollupService.rebuild does"""
+    SaleItem = apps.get_model('src', 'SaleItem')
+    MonthlySalesRollup = apps.get_model('src', 'MonthlySalesRollup')
+
+    aggregated = SaleItem.objects.annotate(
+        month=TruncMonth('sale__sale_date', output_field=models.DateField())
+    ).values('month', 'sale__user_id', 'product_id').annotate(
+        total_quantity=models.Sum('quantity'),
+        revenue=models.Sum(models.F('quantity') * models.F('unit_price')),
+    ).order_by()
+    select_sql, params = aggregated.query.sql_with_params()
+    table = schema_editor.quote_name(MonthlySalesRollup._meta.db_table)
+    schema_editor.execute(
+        f"INSERT INTO {table} (month, user_id, product_id, quantity, revenue) {select_sql}",
+        params,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0003_sale_total_amount_saleitem_unit_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('quantity', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='src.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'product'], name='monthly_rollup_month_prod_idx')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'user', 'product'), name='monthly_rollup_month_user_product')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
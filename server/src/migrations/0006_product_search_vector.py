@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 01:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = """
+CREATE FUNCTION src_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sku, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER src_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, sku, description ON src_product
+    FOR EACH ROW EXECUTE FUNCTION src_product_search_vector_update();
+
+UPDATE src_product SET name = name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS src_product_search_vector_trigger ON src_product;
+DROP FUNCTION IF EXISTS src_product_search_vector_update();
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0005_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 01:47
+
+import src.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0006_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, upload_to=src.models.product_cover_path),
+        ),
+    ]
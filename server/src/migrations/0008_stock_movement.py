@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 02:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Opening balances, so the ledger sums to the current stock
+OPENING_BALANCES = """
+INSERT INTO src_stockmovement (product_id, quantity, kind, created_at)
+SELECT id, stock, 'adjustment', now() FROM src_product WHERE stock <> 0;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('src', '0007_product_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='src.product')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='src.sale')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunSQL(OPENING_BALANCES, migrations.RunSQL.noop),
+    ]
@@ -1,8 +1,13 @@
+import hashlib
+import os
 from django.utils import timezone
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.contrib.auth.models import AbstractUser
+from typing import Iterable, List, Optional, Set
 from uuid import uuid4
 
 class User(AbstractUser):
@@ -14,9 +19,24 @@ class User(AbstractUser):
     )
     username = models.CharField(max_length=150, unique=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_id_idx'),
+        ]
+
     def __str__(self):
         return f"User {self.username} - ID: {self.id}"
 
+def product_cover_path(instance: 'Product', filename: str) -> str:
+    """Name covers after their content, so a new image always gets a new URL"""
+    upload = instance.cover_image.file
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    extension = os.path.splitext(filename)[1].lower()
+    return f'product_covers/{digest.hexdigest()[:32]}{extension}'
+
 class Product(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -36,11 +56,91 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
-    cover_image = models.ImageField(upload_to='product_covers/', blank=True, null=True)
+    cover_image = models.ImageField(upload_to=product_cover_path, blank=True, null=True)
+    # Resized copies of cover_image by size and format, filled in by src.images
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Weighted name (A), SKU (B) and description (C), maintained by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_at_id_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['sku'], name='product_sku_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"Product {self.name} - SKU: {self.sku}"
 
+def serialized_columns(model, fields: Iterable[str], prefix: str = '') -> List[str]:
+    """Columns behind the named serializer fields, for only(); always the primary key"""
+    concrete = {field.name for field in model._meta.concrete_fields}
+    names = [model._meta.pk.name] + [name for name in fields if name in concrete]
+    return [prefix + name for name in dict.fromkeys(names)]
+
+class SaleQuerySet(models.QuerySet):
+    def with_user(self) -> 'SaleQuerySet':
+        return self.select_related('user')
+
+    def with_items(self) -> 'SaleQuerySet':
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                # In line order, so every serialization of a sale lists them alike
+                queryset=SaleItem.objects.select_related('product').order_by('id'),
+            )
+        )
+
+    def with_details(self) -> 'SaleQuerySet':
+        """Everything SaleSerializer needs, in a constant number of queries"""
+        return self.with_user().with_items()
+
+    def for_fieldsets(
+        self,
+        fields: Optional[Set[str]] = None,
+        product_fields: Optional[Set[str]] = None,
+        expand: Optional[Set[str]] = None,
+    ) -> 'SaleQuerySet':
+        """with_details() trimmed to a sparse SaleSerializer representation.
+
+        ``fields`` and ``product_fields`` name the serialized sale and product
+        fields, ``expand`` the relations embedded rather than given by id;
+        None stands for all of them. Products that are not embedded are
+        prefetched once per distinct product, for side-loading.
+        """
+        fields = {'id', 'user', 'sale_date', 'items', 'total_price'} if fields is None else fields
+        expand = {'user', 'items.product'} if expand is None else expand
+
+        columns = ['id', 'sale_date']
+        if 'total_price' in fields:
+            columns.append('total_amount')
+        queryset = self
+        if 'user' in fields:
+            columns.append('user')
+            if 'user' in expand:
+                queryset = queryset.select_related('user')
+                columns += ['user__id', 'user__username', 'user__email']
+        queryset = queryset.only(*columns)
+        if 'items' not in fields:
+            return queryset
+
+        item_columns = ['id', 'sale', 'product', 'quantity', 'unit_price']
+        if 'items.product' not in expand:
+            products = Product.objects.all()
+            if product_fields is not None:
+                products = products.only(*serialized_columns(Product, product_fields))
+            items = SaleItem.objects.only(*item_columns).prefetch_related(
+                models.Prefetch('product', queryset=products)
+            )
+        elif product_fields is not None:
+            items = SaleItem.objects.select_related('product').only(
+                *item_columns, *serialized_columns(Product, product_fields, prefix='product__')
+            )
+        else:
+            items = SaleItem.objects.select_related('product')
+        return queryset.prefetch_related(models.Prefetch('items', queryset=items.order_by('id')))
+
 class Sale(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -54,14 +154,23 @@ class Sale(models.Model):
         related_name='sales'
     )
     sale_date = models.DateTimeField(default=timezone.now)
+    total_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0'),
+    )
+
+    objects = SaleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sale_date', 'id'], name='sale_sale_date_id_idx'),
+        ]
 
     @property
     def total_price(self) -> Decimal:
-        """Calculate the total price of the sale"""
-        return Decimal(sum(
-            item.quantity * item.product.price 
-            for item in self.items.all() # type: ignore
-        ))
+        """Total captured when the sale was created"""
+        return self.total_amount
 
     def __str__(self) -> str:
         return f"Sale {self.id} by {self.user.username}"
@@ -70,6 +179,56 @@ class SaleItem(models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity} (Sale {self.sale.id})"
+
+class StockMovement(models.Model):
+    """Append-only ledger of stock changes; Product.stock is their running sum.
+
+    Rows are only ever inserted, by StockService, which applies them to
+    Product.stock in the same transaction.
+    """
+    class Kind(models.TextChoices):
+        SALE = 'sale', 'Sale'
+        RESTOCK = 'restock', 'Restock'
+        ADJUSTMENT = 'adjustment', 'Adjustment'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    # Signed: sales are negative, restocks positive
+    quantity = models.IntegerField()
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    sale = models.ForeignKey(
+        Sale, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.quantity:+d} {self.product_id}"
+
+class MonthlySalesRollup(models.Model):
+    """Revenue per month, user and product, kept up to date by SaleService"""
+    month = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'user', 'product'], name='monthly_rollup_month_user_product'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['month', 'product'], name='monthly_rollup_month_prod_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m} {self.user_id} {self.product_id}: {self.revenue}"
@@ -0,0 +1,141 @@
+import json
+from typing import List
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination whose cost does not grow with the page depth.
+
+    Cursors hold the whole ordering tuple of the last row, which must be
+    unique, so rows tying on the leading columns are still paged by keyset
+    rather than by DRF's capped offset. DRF's paginate_queryset is split
+    around its single page query so async views can run that query with the
+    async ORM (apaginate_queryset).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self._page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self._paginate_results(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self._page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self._paginate_results([obj async for obj in page_queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        """The page query, including one extra row to detect a following page"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+        self._cursor_state = (offset, reverse, current_position)
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._after(self._decode_position(current_position)))
+
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _after(self, values: List[str]) -> Q:
+        """Rows past the position: (a > x) OR (a = x AND b > y) OR ..., per column direction"""
+        after = Q()
+        equal = Q()
+        lookups = []
+        for order, value in zip(self.ordering, values):
+            # Test for: (cursor reversed) XOR (queryset reversed)
+            lookup = 'lt' if self.cursor.reverse != order.startswith('-') else 'gt'
+            attr = order.lstrip('-')
+            lookups.append((attr, lookup))
+            after |= equal & Q(**{f'{attr}__{lookup}': value})
+            equal &= Q(**{attr: value})
+        # Redundant, but bounds the index scan on the leading column
+        attr, lookup = lookups[0]
+        return Q(**{f'{attr}__{lookup}e': values[0]}) & after
+
+    def _decode_position(self, position: str) -> List[str]:
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            attr = order.lstrip('-')
+            values.append(str(instance[attr] if isinstance(instance, dict) else getattr(instance, attr)))
+        return json.dumps(values)
+
+    def _paginate_results(self, results):
+        """Same bookkeeping as CursorPagination once the page rows are fetched"""
+        offset, reverse, current_position = self._cursor_state
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+class ProductCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+class ProductSearchCursorPagination(KeysetPagination):
+    page_size = 20
+    ordering = ('-relevance', 'id')
+
+class SaleCursorPagination(KeysetPagination):
+    ordering = ('-sale_date', '-id')
+
+class SaleItemCursorPagination(KeysetPagination):
+    ordering = ('-id',)
+
+class UserCursorPagination(KeysetPagination):
+    ordering = ('-date_joined', '-id')
+
+class ProductRollupCursorPagination(KeysetPagination):
+    ordering = ('-month', '-total_revenue', 'product_id')
@@ -0,0 +1,253 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time from the request reaching Django to its response',
+    ['method', 'view'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter('http_requests', 'Responses by view and status code', ['method', 'view', 'status'])
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time per request spent waiting on the database',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+SERIALIZE_DURATION = Histogram(
+    'http_response_serialize_duration_seconds', 'Time per request spent serializing the response data',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+RENDER_DURATION = Histogram(
+    'http_response_render_duration_seconds', 'Time per request spent rendering the response',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body sizes, for responses that are not streamed',
+    ['view'], buckets=tuple(4 ** n * 256 for n in range(8)),
+)
+
+def metrics_payload():
+    """Prometheus exposition of the metrics, merged across workers in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+class RequestMetrics:
+    """Query count and timings of one request; also the execute wrapper that counts queries"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_started: Optional[tuple] = None
+        self.serialize_seconds: Optional[float] = None
+        self.render_started: Optional[float] = None
+        self.render_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    def start_serializing(self) -> None:
+        self.serialize_started = (time.perf_counter(), self.db_seconds)
+
+    def stop_serializing(self) -> None:
+        """Add the time since start_serializing, less the queries made meanwhile"""
+        if self.serialize_started is None:
+            return
+        started, db_seconds = self.serialize_started
+        elapsed = time.perf_counter() - started - (self.db_seconds - db_seconds)
+        self.serialize_seconds = (self.serialize_seconds or 0.0) + elapsed
+        self.serialize_started = None
+
+    def rendered(self, response) -> None:
+        self.render_seconds = time.perf_counter() - self.render_started
+
+# The metrics of the request being handled; sync_to_async copies it into its thread
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('current_metrics', default=None)
+
+def count_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """Count queries on every connection, whichever thread the request runs them in.
+
+    Connections are per thread, and under ASGI sync views and ORM calls run in
+    sync_to_async's thread, out of the middleware's reach; the wrapper
+    finds the request's metrics through current_metrics instead.
+    """
+    if count_query not in connection.execute_wrappers:
+        # First, so an execute_wrapper() block this connect happens in pops its own wrapper
+        connection.execute_wrappers.insert(0, count_query)
+
+def start_serializing(request) -> None:
+    metrics = getattr(request, '_request_metrics', None)
+    if metrics is not None:
+        metrics.start_serializing()
+
+class SerializationTimingMixin:
+    """Times a read's serialization, for the serialize metric and Server-Timing.
+
+    It runs from the page or object being loaded to the response being
+    finalized; queries made meanwhile (lazy relations, side-loaded
+    products) count as db time instead.
+    """
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.start_serializing()
+        return page
+
+    def get_object(self):
+        instance = super().get_object()
+        self.start_serializing()
+        return instance
+
+    def start_serializing(self) -> None:
+        if self.request.method in ('GET', 'HEAD'):
+            start_serializing(self.request)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        metrics = getattr(request, '_request_metrics', None)
+        if metrics is not None:
+            metrics.stop_serializing()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+class RequestProfilingMiddleware:
+    """Records each request's wall time, DB queries and time, serialize and render time and size.
+
+    They feed the Prometheus metrics above, labelled by URL name, and with
+    SERVER_TIMING a Server-Timing header, where app is the rest of the time:
+    middleware and view code. Serialization is only timed in views using
+    SerializationTimingMixin. With PROFILE_SAMPLE_RATE, that
+    fraction of (sync) requests runs under cProfile, and the profile is saved
+    to PROFILE_DIR when the request took more than PROFILE_SLOW_MS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Keeps the handler from running the hook in a thread
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = request._request_metrics = RequestMetrics()
+        profiler = self._start_profiler()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        if profiler is not None:
+            profiler.disable()
+        self._record(request, response, metrics, profiler)
+        return response
+
+    async def __acall__(self, request):
+        metrics = request._request_metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self._record(request, response, metrics, None)
+        return response
+
+    def process_template_response(self, request, response):
+        return self._time_render(request, response)
+
+    async def _aprocess_template_response(self, request, response):
+        return self._time_render(request, response)
+
+    @staticmethod
+    def _time_render(request, response):
+        metrics = getattr(request, '_request_metrics', None)
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(metrics.rendered)
+        return response
+
+    @staticmethod
+    def _start_profiler() -> Optional[cProfile.Profile]:
+        if not settings.PROFILE_SAMPLE_RATE or random.random() >= settings.PROFILE_SAMPLE_RATE:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another thread is already profiling
+            return None
+        return profiler
+
+    def _record(self, request, response, metrics: RequestMetrics, profiler) -> None:
+        elapsed = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = (match.view_name or match.route) if match else 'unmatched'
+
+        REQUEST_DURATION.labels(request.method, view).observe(elapsed)
+        REQUESTS.labels(request.method, view, response.status_code).inc()
+        DB_QUERIES.labels(view).observe(metrics.queries)
+        DB_DURATION.labels(view).observe(metrics.db_seconds)
+        if metrics.serialize_seconds is not None:
+            SERIALIZE_DURATION.labels(view).observe(metrics.serialize_seconds)
+        if metrics.render_started is not None:
+            RENDER_DURATION.labels(view).observe(metrics.render_seconds)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+
+        if settings.SERVER_TIMING:
+            serialize_seconds = metrics.serialize_seconds or 0.0
+            app_seconds = elapsed - metrics.db_seconds - serialize_seconds - metrics.render_seconds
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries", '
+                f'app;dur={app_seconds * 1000:.1f}, '
+                f'serialize;dur={serialize_seconds * 1000:.1f}, '
+                f'render;dur={metrics.render_seconds * 1000:.1f}, '
+                f'total;dur={elapsed * 1000:.1f}'
+            )
+        if profiler is not None and elapsed * 1000 >= settings.PROFILE_SLOW_MS:
+            self._save_profile(profiler, view, elapsed)
+
+    @staticmethod
+    def _save_profile(profiler: cProfile.Profile, view: str, elapsed: float) -> None:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '-', view)
+        name = f'{slug}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{elapsed * 1000:.0f}ms.prof'
+        path = os.path.join(settings.PROFILE_DIR, name)
+        profiler.dump_stats(path)
+        logger.info('Saved the profile of a %.0f ms request to %s', elapsed * 1000, path)
@@ -0,0 +1,26 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer output, encoded by orjson.
+
+    Produces the same bytes as DRF's renderer for serializer output: strings,
+    ints, bools, lists and dicts are encoded natively and anything else goes
+    through DRF's encoder. Floats are the exception (orjson writes ``1e16``
+    where Python writes ``1e+16``, and null for NaN), so use it on views
+    whose payloads have none. Indented and ASCII-only renders are left to DRF.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if data is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except TypeError:
+            # E.g. integers beyond 64 bits, which json handles
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
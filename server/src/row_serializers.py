@@ -0,0 +1,203 @@
+import decimal
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+class UnsupportedField(Exception):
+    """A serializer field RowSerializer cannot reproduce exactly"""
+
+# to_representation methods with a builtin that returns the same
+_BUILTIN_CONVERTERS = {
+    serializers.CharField.to_representation: str,
+    serializers.IntegerField.to_representation: int,
+}
+
+def _converter(field) -> Callable[[Any], Any]:
+    """field.to_representation, with the per-value setting lookups done once"""
+    to_representation = type(field).to_representation
+    if to_representation in _BUILTIN_CONVERTERS:
+        return _BUILTIN_CONVERTERS[to_representation]
+    if to_representation is serializers.UUIDField.to_representation and field.uuid_format == 'hex_verbose':
+        return str
+    if to_representation is serializers.DecimalField.to_representation:
+        return _decimal_converter(field)
+    if (
+        to_representation is serializers.DateTimeField.to_representation
+        and type(field).enforce_timezone is serializers.DateTimeField.enforce_timezone
+    ):
+        return _datetime_converter(field)
+    return field.to_representation
+
+def _decimal_converter(field) -> Callable[[Any], Any]:
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if (
+        field.decimal_places is None or not coerce_to_string
+        or field.localize or field.normalize_output
+    ):
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+def _datetime_converter(field) -> Callable[[Any], Any]:
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if getattr(value, 'tzinfo', None) is None:
+            return field.to_representation(value)
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+def _file_converter(field, storage) -> Callable[[Any], Any]:
+    """FileField.to_representation for a file name instead of a FieldFile"""
+    request = field.context.get('request')
+    use_url = getattr(field, 'use_url', True)
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+class RowSerializer:
+    """A bound, read-only ModelSerializer compiled to a converter over values() rows.
+
+    Each field is converted as its to_representation would, so the output is
+    the same while DRF's per-field attribute lookups and checks are skipped.
+    Compiling the bound serializer keeps its sparse fieldsets and ``?expand=``.
+
+    Fields that are not model columns need a ``row_sources`` entry on the
+    serializer naming the column they read; for SerializerMethodFields the
+    method then gets an object with just that attribute. Nested serializers
+    are supported over foreign keys and reverse foreign keys, one query per
+    relation; related objects shared by many rows are fetched and converted
+    once. Anything else raises UnsupportedField.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.pk_key = self.model._meta.pk.name
+        self.columns: List[str] = [self.pk_key]
+        self._getters: List[Tuple[str, Callable[[dict], Any]]] = []
+        # (row key the related rows are stored under, serializer, is_many, join column)
+        self._relations: List[Tuple[str, 'RowSerializer', bool, str]] = []
+        self._converted: Dict[Any, Dict[str, Any]] = {}
+
+        row_sources = getattr(serializer, 'row_sources', {})
+        concrete = {field.name: field for field in self.model._meta.concrete_fields}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = row_sources.get(name, field.source)
+            # to_representation stores each row's related rows under this key
+            store = f'__{name}'
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(source)
+                if not relation.one_to_many:
+                    raise UnsupportedField(f'{name}: not a reverse foreign key')
+                child = RowSerializer(field.child)
+                self._relations.append((store, child, True, relation.field.name))
+                self._getters.append((
+                    name, lambda row, store=store, child=child: [
+                        child._convert(child_row) for child_row in row[store]
+                    ]
+                ))
+                continue
+            if source not in concrete:
+                raise UnsupportedField(f'{name}: {source} is not a column of {self.model.__name__}')
+
+            self.columns.append(source)
+            if isinstance(field, serializers.BaseSerializer):
+                child = RowSerializer(field)
+                self._relations.append((store, child, False, source))
+                self._getters.append((
+                    name, lambda row, store=store, child=child: child._convert_once(row[store])
+                ))
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                method = getattr(field.parent, field.method_name)
+                self._getters.append((
+                    name, lambda row, method=method, source=source: method(
+                        SimpleNamespace(**{source: row[source]})
+                    )
+                ))
+                continue
+            if hasattr(field, 'row_representation'):
+                convert = field.row_representation
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                convert = field.pk_field.to_representation if field.pk_field else (lambda pk: pk)
+            elif isinstance(field, serializers.FileField):
+                convert = _file_converter(field, concrete[source].storage)
+            elif isinstance(field, serializers.RelatedField):
+                raise UnsupportedField(f'{name}: related fields other than primary keys')
+            else:
+                convert = _converter(field)
+            self._getters.append((
+                name, lambda row, source=source, convert=convert: (
+                    None if (value := row[source]) is None else convert(value)
+                )
+            ))
+        self.columns = list(dict.fromkeys(self.columns))
+
+    def values(self, queryset, *extra: str):
+        """The queryset's rows with the columns this serializer reads, plus ``extra``"""
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.columns, *extra]))
+
+    def to_representation(self, rows: Iterable[dict]) -> List[Dict[str, Any]]:
+        rows = list(rows)
+        self._fetch_relations(rows)
+        # Converted row by row, in order, like the serializer would
+        return [self._convert(row) for row in rows]
+
+    def _fetch_relations(self, rows: List[dict]) -> None:
+        """Store each row's related rows in it, with one query per relation"""
+        for store, child, many, column in self._relations:
+            if many:
+                # Model ordering, else primary key order like SaleQuerySet's prefetches
+                related = list(child.values(
+                    child.model._default_manager.filter(
+                        **{f'{column}__in': [row[self.pk_key] for row in rows]}
+                    ).order_by(*child.model._meta.ordering or [child.pk_key]),
+                    column,
+                ))
+                grouped = defaultdict(list)
+                for related_row in related:
+                    grouped[related_row[column]].append(related_row)
+                for row in rows:
+                    row[store] = grouped.get(row[self.pk_key], [])
+            else:
+                pks = {row[column] for row in rows} - {None}
+                related = list(child.values(child.model._base_manager.filter(pk__in=pks)))
+                by_pk = {related_row[child.pk_key]: related_row for related_row in related}
+                for row in rows:
+                    row[store] = by_pk.get(row[column])
+            child._fetch_relations(related)
+
+    def _convert(self, row: dict) -> Dict[str, Any]:
+        return {name: get(row) for name, get in self._getters}
+
+    def _convert_once(self, row: Optional[dict]) -> Optional[Dict[str, Any]]:
+        """A related row's representation, computed once however many rows share it"""
+        if row is None:
+            return None
+        pk = row[self.pk_key]
+        if pk not in self._converted:
+            self._converted[pk] = self._convert(row)
+        return self._converted[pk]
@@ -1,6 +1,12 @@
+from typing import Dict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Product, Sale, SaleItem, User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .models import Product, Sale, SaleItem, StockMovement, User
+from .services import SaleService, StockService
+from .tokens import CachedBlacklistRefreshToken
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom JWT token serializer that includes user information"""
@@ -13,6 +19,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['email'] = user.email
         token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
         
         return token
 
@@ -29,6 +36,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return data
 
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that checks the blacklist through the JTI Bloom filter"""
+    token_class = CachedBlacklistRefreshToken
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(write_only=True, min_length=8)
@@ -61,29 +72,193 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email']
 
-class ProductSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """Drops the fields a GET did not ask for.
+
+    Views put the requested names in the context as ``fieldsets``, keyed by
+    ``resource_type`` (``?fields=`` for the primary resource and
+    ``?fields[<type>]=`` for nested or side-loaded ones).
+    """
+    resource_type: str
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fieldsets', {}).get(self.resource_type)
+        if requested is None:
+            return fields
+        unknown = requested - set(fields)
+        if unknown:
+            raise serializers.ValidationError({
+                f'fields[{self.resource_type}]': f'Unknown fields: {", ".join(sorted(unknown))}.'
+            })
+        return {name: field for name, field in fields.items() if name in requested}
+
+class SideloadedProductField(serializers.RelatedField):
+    """A product by id, collected into the context's ``sideloaded_products`` if present"""
+
+    def to_representation(self, product):
+        sideloaded = self.context.get('sideloaded_products')
+        if sideloaded is not None:
+            sideloaded.setdefault(product.pk, product)
+        return str(product.pk)
+
+    def row_representation(self, pk) -> str:
+        """The same for a RowSerializer, which only has the id to collect"""
+        sideloaded = self.context.get('sideloaded_products')
+        if sideloaded is not None:
+            sideloaded.setdefault(pk, None)
+        return str(pk)
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    resource_type = 'product'
+    row_sources = {'cover_variants': 'cover_variants'}
+    cover_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'sku', 'stock',
-            'created_at', 'updated_at', 'is_active', 'cover_image'
+            'created_at', 'updated_at', 'is_active', 'cover_image', 'cover_variants'
+        ]
+
+    def create(self, validated_data):
+        stock = validated_data.pop('stock', 0)
+        with transaction.atomic():
+            product = super().create(validated_data)
+            if stock:
+                StockService.set_stock(product.pk, stock, StockMovement.Kind.RESTOCK)
+                product.refresh_from_db(fields=['stock', 'updated_at'])
+        return product
+
+    def update(self, instance, validated_data):
+        """Save only the fields sent; stock goes through the ledger as an adjustment.
+
+        A full save would write back the stock read before the request,
+        undoing any sale made meanwhile.
+        """
+        stock = validated_data.pop('stock', None)
+        with transaction.atomic():
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            if validated_data:
+                instance.save(update_fields=[*validated_data, 'updated_at'])
+            if stock is not None:
+                StockService.set_stock(instance.pk, stock)
+                instance.refresh_from_db(fields=['stock', 'updated_at'])
+        return instance
+
+    def get_cover_variants(self, product: Product) -> Dict[str, Dict[str, str]]:
+        """URLs of the resized covers by size and format, empty until generated"""
+        request = self.context.get('request')
+        urls = {}
+        for size, formats in product.cover_variants.items():
+            urls[size] = {}
+            for extension, path in formats.items():
+                url = default_storage.url(path)
+                urls[size][extension] = request.build_absolute_uri(url) if request else url
+        return urls
+
+class ProductSearchSerializer(ProductSerializer):
+    similarity = serializers.FloatField(read_only=True)
+    relevance = serializers.FloatField(read_only=True)
+    total_revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    total_sold = serializers.IntegerField(read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + [
+            'similarity', 'relevance', 'total_revenue', 'total_sold'
         ]
 
 class SaleItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+    # Resolved and locked by SaleService, which rejects unknown products
+    product_id = serializers.UUIDField(write_only=True)
 
     class Meta:
         model = SaleItem
-        fields = ['id', 'product', 'product_id', 'quantity']
+        fields = ['id', 'product', 'product_id', 'quantity', 'unit_price']
+        read_only_fields = ['unit_price']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.context.get('expand')
+        if expand is not None and 'items.product' not in expand:
+            fields['product'] = SideloadedProductField(read_only=True)
+        return fields
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    resource_type = 'sale'
+    row_sources = {'total_price': 'total_amount'}
     user = UserSerializer(read_only=True)
-    items = SaleItemSerializer(many=True, read_only=True)
-    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    items = SaleItemSerializer(many=True, allow_empty=False)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Sale
         fields = ['id', 'user', 'sale_date', 'items', 'total_price']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.context.get('expand')
+        if 'user' in fields and expand is not None and 'user' not in expand:
+            fields['user'] = serializers.PrimaryKeyRelatedField(
+                read_only=True, pk_field=serializers.UUIDField()
+            )
+        return fields
+
+    def create(self, validated_data):
+        items = [SaleItem(**item) for item in validated_data.pop('items')]
+        sale = Sale(**validated_data)
+        try:
+            sale = SaleService.create_sales([(sale, items)])[0]
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'items': e.messages})
+        # Read back with its user and items, as the response serializes them
+        return Sale.objects.with_details().get(pk=sale.pk)
+
+class SaleItemInputSerializer(serializers.Serializer):
+    """A sale line as sent by POS terminals; products are resolved by the service"""
+    product_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class SaleInputSerializer(serializers.Serializer):
+    sale_date = serializers.DateTimeField(required=False)
+    items = SaleItemInputSerializer(many=True, allow_empty=False)
+
+class OptionalSalesSerializer(serializers.Serializer):
+    """Drops the per-sale detail list unless the view asks for it"""
+    sales = SaleSerializer(many=True, read_only=True)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('include_sales'):
+            fields.pop('sales')
+        return fields
+
+class UserMonthSalesSerializer(OptionalSalesSerializer):
+    year = serializers.IntegerField()
+    month = serializers.IntegerField()
+    month_name = serializers.CharField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class UserSalesByMonthSerializer(serializers.Serializer):
+    user = UserSerializer()
+    months = UserMonthSalesSerializer(many=True)
+
+class MonthUserSalesSerializer(OptionalSalesSerializer):
+    user = UserSerializer()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class MonthSalesByUserSerializer(serializers.Serializer):
+    year = serializers.IntegerField()
+    month = serializers.IntegerField()
+    month_name = serializers.CharField()
+    user_sales = MonthUserSalesSerializer(many=True)
+
+class ProductMonthSalesSerializer(serializers.Serializer):
+    month = serializers.DateField()
+    product_id = serializers.UUIDField()
+    name = serializers.CharField(source='product__name')
+    sku = serializers.CharField(source='product__sku')
+    quantity = serializers.IntegerField(source='total_quantity')
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, source='total_revenue')
@@ -1,38 +1,323 @@
-from typing import Dict, List, Tuple, Any, Optional
-from django.db import transaction
+import csv
+import io
+import json
+import re
+from contextlib import nullcontext
+from itertools import islice
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Set, TextIO, Tuple, Any, Optional
+from django.db import connection, transaction
 from django.core.exceptions import ValidationError
-from django.contrib.postgres.search import TrigramSimilarity
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
 from django.db import models
 from django.db.models import QuerySet
-from datetime import datetime
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from datetime import date, datetime, time, timedelta
 from collections import defaultdict
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext
 from calendar import month_name
 from decimal import Decimal
-from .models import Sale, Product, User, SaleItem
+from .cache import bump_catalog_version_on_commit
+from .hashers import hash_passwords, password_hashing_pool
+from .models import Sale, Product, User, SaleItem, MonthlySalesRollup, StockMovement
+
+# Must match the configuration used by the search_vector trigger (migration 0006)
+PRODUCT_SEARCH_CONFIG = 'simple'
 
 class SaleService:
     @staticmethod
     def create_sale(user: User, items: list[SaleItem]) -> Sale:
+        return SaleService.create_sales([(Sale(user=user), items)])[0]
+
+    @staticmethod
+    def create_sales(orders: List[Tuple[Sale, List[SaleItem]]]) -> List[Sale]:
+        """Create many sales, taking their items out of stock in one ledger write.
+
+        Stock is applied last, so the product rows are only locked from that
+        UPDATE to the commit instead of for the whole transaction.
+        """
         with transaction.atomic():
-            sale = Sale.objects.create(user=user)
-            
-            for item in items:
-                product = Product.objects.select_for_update().get(id=item.product.pk)
-                
-                if item.quantity > product.stock:
-                    raise ValidationError(
-                        f"Estoque insuficiente para {product.name} "
-                        f"(disponível: {product.stock})"
+            all_items = [item for _, items in orders for item in items]
+
+            # Capture prices at sale time so later price edits don't rewrite history
+            prices = dict(Product.objects.filter(
+                pk__in={item.product_id for item in all_items}
+            ).values_list('pk', 'price'))
+            for item in all_items:
+                if item.product_id not in prices:
+                    raise ValidationError(f"Produto não encontrado: {item.product_id}")
+            for sale, items in orders:
+                for item in items:
+                    item.unit_price = prices[item.product_id]
+                sale.total_amount = sum(
+                    (item.quantity * item.unit_price for item in items), Decimal('0')
+                )
+
+            sales = Sale.objects.bulk_create([sale for sale, _ in orders])
+            for sale, items in orders:
+                for item in items:
+                    item.sale = sale
+            SaleItem.objects.bulk_create(all_items)
+            SalesRollupService.record_sales(orders)
+            StockService.apply([
+                StockMovement(
+                    product_id=item.product_id, quantity=-item.quantity,
+                    kind=StockMovement.Kind.SALE, sale=sale,
+                )
+                for sale, items in orders for item in items
+            ])
+
+            return sales
+
+    @staticmethod
+    def recompute_totals(chunk_size: int = 1000) -> Iterator[int]:
+        """Recompute Sale.total_amount from the stored line prices, chunk by chunk.
+
+        Walks sales in primary key order so each chunk is a bounded UPDATE;
+        yields the number of sales processed so far.
+        """
+        item_totals = SaleItem.objects.filter(
+            sale=models.OuterRef('pk')
+        ).values('sale').annotate(
+            total=models.Sum(models.F('quantity') * models.F('unit_price'))
+        ).values('total')
+
+        processed = 0
+        last_pk = None
+        while True:
+            chunk = Sale.objects.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            pks = list(chunk.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+
+            with transaction.atomic():
+                Sale.objects.filter(pk__in=pks).update(
+                    total_amount=Coalesce(
+                        models.Subquery(item_totals), Decimal('0'),
+                        output_field=models.DecimalField(max_digits=12, decimal_places=2),
                     )
-                
-                item.sale = sale
-                item.save()
-                
-                product.stock -= item.quantity
-                product.save()
-                
-            return sale
+                )
+
+            processed += len(pks)
+            last_pk = pks[-1]
+            yield processed
+
+class StockService:
+    """Stock changes, written to the StockMovement ledger and applied to Product.stock.
+
+    The ledger is the audit trail; it does not take the lock off a product's
+    row. Every sale still updates Product.stock in its own transaction, so
+    concurrent checkouts of one product still queue on that row, only for a
+    shorter time: from the ledger write, issued last, to commit. Deferring
+    the counter to a later compaction would remove that wait, but a sale
+    then needs another way to reserve stock without overselling, which
+    brings the serialization back.
+    """
+
+    @staticmethod
+    def apply(movements: List[StockMovement]) -> None:
+        """Insert movements and add them to Product.stock, in the current transaction.
+
+        One statement journals the movements, locks the products in primary
+        key order, so concurrent multi-product sales can't deadlock, and
+        updates the stock only where it stays non-negative. The locks last
+        until commit: call it last.
+        """
+        deltas: Dict[Any, int] = defaultdict(int)
+        for movement in movements:
+            deltas[movement.product_id] += movement.quantity
+        if not deltas:
+            return
+
+        quote = connection.ops.quote_name
+        products = quote(Product._meta.db_table)
+        ledger = quote(StockMovement._meta.db_table)
+        # Errors abort the caller's transaction anyway, so no savepoint is needed
+        with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH moved AS ("
+                f"INSERT INTO {ledger} (product_id, quantity, kind, sale_id, created_at) "
+                f"SELECT * FROM unnest(%s::uuid[], %s::integer[], %s::varchar[], %s::uuid[], "
+                f"%s::timestamptz[])"
+                f"), locked AS MATERIALIZED ("
+                f"SELECT id FROM {products} WHERE id = ANY(%s::uuid[]) ORDER BY id FOR NO KEY UPDATE"
+                f") "
+                f"UPDATE {products} AS product "
+                f"SET stock = product.stock + change.delta, updated_at = %s "
+                f"FROM locked, unnest(%s::uuid[], %s::integer[]) AS change (id, delta) "
+                f"WHERE product.id = locked.id AND product.id = change.id "
+                f"AND product.stock + change.delta >= 0 "
+                f"RETURNING product.id",
+                [
+                    [movement.product_id for movement in movements],
+                    [movement.quantity for movement in movements],
+                    [movement.kind for movement in movements],
+                    [movement.sale_id for movement in movements],
+                    [movement.created_at for movement in movements],
+                    list(deltas), timezone.now(), list(deltas), list(deltas.values()),
+                ],
+            )
+            updated = {pk for pk, in cursor.fetchall()}
+            if len(updated) < len(deltas):
+                StockService._raise_stock_error(deltas, updated)
+        bump_catalog_version_on_commit()
+
+    @staticmethod
+    def _raise_stock_error(deltas: Dict[Any, int], updated: Set[Any]) -> None:
+        stocks = {
+            pk: (name, stock) for pk, name, stock in Product.objects.filter(
+                pk__in=[pk for pk in deltas if pk not in updated]
+            ).values_list('pk', 'name', 'stock')
+        }
+        for product_id in deltas:
+            if product_id in updated:
+                continue
+            if product_id not in stocks:
+                raise ValidationError(f"Produto não encontrado: {product_id}")
+            name, stock = stocks[product_id]
+            raise ValidationError(f"Estoque insuficiente para {name} (disponível: {stock})")
+
+    @staticmethod
+    def set_stock(
+        product_id: Any, stock: int, kind: str = StockMovement.Kind.ADJUSTMENT
+    ) -> None:
+        """Record the movement that brings a product's stock to ``stock``"""
+        with transaction.atomic():
+            current = Product.objects.select_for_update(no_key=True).values_list(
+                'stock', flat=True
+            ).get(pk=product_id)
+            if stock != current:
+                StockService.apply([
+                    StockMovement(product_id=product_id, quantity=stock - current, kind=kind)
+                ])
+
+    @staticmethod
+    def drifted(products: Optional[QuerySet[Product]] = None) -> QuerySet[Product]:
+        """Products whose stock differs from their ledger's sum, annotated with ``ledger``"""
+        ledger = StockMovement.objects.filter(
+            product=models.OuterRef('pk')
+        ).values('product').annotate(total=models.Sum('quantity')).values('total')
+        products = Product.objects.all() if products is None else products
+        return products.annotate(
+            ledger=Coalesce(models.Subquery(ledger), 0)
+        ).exclude(stock=models.F('ledger'))
+
+    @staticmethod
+    def reconcile(batch_size: int = 500) -> int:
+        """Reset every drifted stock to its ledger's sum; returns how many changed.
+
+        Works through the products in primary key order, one batch per
+        transaction, locking only that batch's rows: a movement on one of them
+        waits for the batch to commit, so none lands between the sum and the
+        update, and checkouts of other products carry on. Products whose
+        ledger sums below zero are left alone.
+        """
+        fixed = 0
+        last = None
+        while True:
+            with transaction.atomic():
+                batch = Product.objects.order_by('pk')
+                if last is not None:
+                    batch = batch.filter(pk__gt=last)
+                pks = list(
+                    batch.select_for_update(no_key=True).values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    return fixed
+                last = pks[-1]
+                drifted = StockService.drifted(
+                    Product.objects.filter(pk__in=pks)
+                ).filter(ledger__gte=0)
+                count = Product.objects.filter(pk__in=drifted.values('pk')).update(
+                    stock=Coalesce(
+                        models.Subquery(
+                            StockMovement.objects.filter(product=models.OuterRef('pk')).values(
+                                'product'
+                            ).annotate(total=models.Sum('quantity')).values('total')
+                        ),
+                        0,
+                    ),
+                    updated_at=timezone.now(),
+                )
+                if count:
+                    bump_catalog_version_on_commit()
+                fixed += count
+
+class SalesRollupService:
+    @staticmethod
+    def month_of(moment: datetime) -> date:
+        """First day of the month, in the same time zone TruncMonth uses"""
+        return timezone.localtime(moment).date().replace(day=1)
+
+    @staticmethod
+    def record_sales(orders: List[Tuple[Sale, List[SaleItem]]]) -> None:
+        """Add freshly created sales to MonthlySalesRollup with a single upsert"""
+        deltas: Dict[Tuple[date, Any, Any], List[Any]] = defaultdict(lambda: [0, Decimal('0')])
+        for sale, items in orders:
+            month = SalesRollupService.month_of(sale.sale_date)
+            for item in items:
+                delta = deltas[(month, sale.user_id, item.product_id)]
+                delta[0] += item.quantity
+                delta[1] += item.quantity * item.unit_price
+        if not deltas:
+            return
+
+        table = connection.ops.quote_name(MonthlySalesRollup._meta.db_table)
+        # Sorted keys keep concurrent upserts from locking rows in opposite orders
+        rows = sorted(deltas.items(), key=lambda row: (row[0][0], str(row[0][1]), str(row[0][2])))
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+        params: List[Any] = []
+        for (month, user_id, product_id), (quantity, revenue) in rows:
+            params.extend([month, user_id, product_id, quantity, revenue])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (month, user_id, product_id, quantity, revenue) "
+                f"VALUES {placeholders} "
+                f"ON CONFLICT (month, user_id, product_id) DO UPDATE SET "
+                f"quantity = {table}.quantity + EXCLUDED.quantity, "
+                f"revenue = {table}.revenue + EXCLUDED.revenue",
+                params,
+            )
+
+    @staticmethod
+    def rebuild(since: Optional[date] = None) -> None:
+        """Recompute the rollup from SaleItem with one INSERT ... SELECT.
+
+        The table is locked against record_sales first, so a sale either
+        commits before the rebuild reads the items or adds to it afterwards.
+        """
+        items = SaleItem.objects.all()
+        rollup = MonthlySalesRollup.objects.all()
+        if since is not None:
+            since = since.replace(day=1)
+            start = timezone.make_aware(datetime.combine(since, time.min))
+            items = items.filter(sale__sale_date__gte=start)
+            rollup = rollup.filter(month__gte=since)
+
+        aggregated = items.annotate(
+            month=TruncMonth('sale__sale_date', output_field=models.DateField())
+        ).values('month', 'sale__user_id', 'product_id').annotate(
+            total_quantity=models.Sum('quantity'),
+            revenue=models.Sum(models.F('quantity') * models.F('unit_price')),
+        ).order_by()
+        select_sql, params = aggregated.query.sql_with_params()
+        table = connection.ops.quote_name(MonthlySalesRollup._meta.db_table)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Reads stay allowed; upserts wait until the rebuild commits
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            rollup.delete()
+            cursor.execute(
+                f"INSERT INTO {table} (month, user_id, product_id, quantity, revenue) "
+                f"{select_sql}",
+                params,
+            )
 
 class ProductService:
     @staticmethod
@@ -40,66 +325,449 @@ class ProductService:
         search_term: Optional[str] = None,
         ordering: Optional[str] = None
     ) -> QuerySet[Product]:
-        queryset = Product.objects.annotate(
-            total_revenue=models.Sum(
-                models.F('saleitem__quantity') * models.F('price'),
-                default=0
-            ),
-            total_sold=models.Sum('saleitem__quantity', default=0),
-        )
-
-        if search_term:
-            queryset = queryset.annotate(
-                similarity=TrigramSimilarity('name', search_term)
-            ).filter(similarity__gt=0.1).order_by('-similarity')
+        queryset = ProductService.search_products(search_term) if search_term else Product.objects.all()
+        queryset = ProductService.with_sales_stats(queryset)
 
         if ordering:
             queryset = queryset.order_by(ordering)
 
         return queryset
 
+    @staticmethod
+    def with_sales_stats(queryset: QuerySet[Product]) -> QuerySet[Product]:
+        """Annotate revenue and units sold from MonthlySalesRollup.
+
+        Correlated subqueries over the pre-aggregated rollup only run for the
+        rows actually returned, instead of joining every SaleItem.
+        """
+        product_rollup = MonthlySalesRollup.objects.filter(
+            product=models.OuterRef('pk')
+        ).values('product')
+        return queryset.annotate(
+            total_revenue=Coalesce(
+                models.Subquery(
+                    product_rollup.annotate(total=models.Sum('revenue')).values('total')
+                ),
+                Decimal('0'),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+            total_sold=Coalesce(
+                models.Subquery(
+                    product_rollup.annotate(total=models.Sum('quantity')).values('total')
+                ),
+                0,
+                output_field=models.PositiveBigIntegerField(),
+            ),
+        )
+
+    @staticmethod
+    def search_products(search_term: str) -> QuerySet[Product]:
+        """Rank products by full-text match, falling back to trigrams for typos.
+
+        Every word is matched as a prefix against ``search_vector`` so partial
+        input works for type-ahead; the ``%`` trigram operator on name and SKU
+        catches misspellings. Both filters are served by GIN indexes.
+        """
+        query = ProductService._prefix_query(search_term)
+        similarity = Greatest(
+            TrigramSimilarity('name', search_term),
+            TrigramSimilarity('sku', search_term),
+        )
+        matches = models.Q(name__trigram_similar=search_term) | models.Q(sku__trigram_similar=search_term)
+        if query is None:
+            return Product.objects.filter(matches).annotate(
+                similarity=similarity,
+                relevance=similarity,
+            ).order_by('-relevance', 'id')
+
+        return Product.objects.filter(
+            models.Q(search_vector=query) | matches
+        ).annotate(
+            similarity=similarity,
+            relevance=SearchRank(models.F('search_vector'), query) + similarity,
+        ).order_by('-relevance', 'id')
+
+    @staticmethod
+    def _prefix_query(search_term: str) -> Optional[SearchQuery]:
+        words = re.findall(r'[^\W_]+', search_term.lower())
+        if not words:
+            return None
+        return SearchQuery(
+            ' & '.join(f'{word}:*' for word in words),
+            search_type='raw',
+            config=PRODUCT_SEARCH_CONFIG,
+        )
+
     @staticmethod
     def get_active_products_in_stock() -> QuerySet[Product]:
         return Product.objects.filter(is_active=True, stock__gt=0)
 
+ProductImportRow = Tuple[int, Any]
+ProductImportErrors = List[Tuple[int, Dict[str, List[str]]]]
+
+class ProductImportService:
+    """Upsert products on sku from a supplier feed, one batch at a time.
+
+    Rows are (line number, dict) pairs from read_csv or read_ndjson. Each row
+    only updates the columns it has a value for; missing and empty cells leave
+    an existing product's value alone.
+    """
+    FIELDS = ['sku', 'name', 'description', 'price', 'stock', 'is_active']
+    REQUIRED_FIELDS = {'sku', 'name', 'price'}
+    MAX_PRICE = Decimal('1e8')
+    MAX_STOCK = 2147483647
+
+    FORMATS = ('csv', 'ndjson')
+
+    @staticmethod
+    def format_of(filename: str) -> Optional[str]:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension == 'jsonl':
+            return 'ndjson'
+        return extension if extension in ProductImportService.FORMATS else None
+
+    @staticmethod
+    def read(stream: TextIO, import_format: str) -> Iterator[ProductImportRow]:
+        if import_format == 'csv':
+            return ProductImportService.read_csv(stream)
+        return ProductImportService.read_ndjson(stream)
+
+    @staticmethod
+    def read_csv(stream: TextIO) -> Iterator[ProductImportRow]:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+    @staticmethod
+    def read_ndjson(stream: TextIO) -> Iterator[ProductImportRow]:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+
+    @staticmethod
+    def import_products(
+        rows: Iterable[ProductImportRow], batch_size: int = 1000
+    ) -> Iterator[Tuple[int, int, ProductImportErrors]]:
+        """Validate and upsert rows in batches of one INSERT ... ON CONFLICT per set of columns.
+
+        Yields (processed, upserted, errors) after every batch, where errors
+        lists the batch's rejected rows as (line, {field: messages}).
+        """
+        processed = upserted = 0
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            products: Dict[str, Dict[str, Any]] = {}
+            errors: ProductImportErrors = []
+            for line, row in batch:
+                values, row_errors = ProductImportService._clean_row(row)
+                if row_errors:
+                    errors.append((line, row_errors))
+                    continue
+                # A repeated SKU can't be upserted twice in one statement; the last row wins
+                products[values['sku']] = values
+
+            if products:
+                with transaction.atomic():
+                    ProductImportService._upsert(list(products.values()))
+                    # No post_save signal fires for the upsert, so bump the version here
+                    bump_catalog_version_on_commit()
+
+            processed += len(batch)
+            upserted += len(products)
+            yield processed, upserted, errors
+
+    @staticmethod
+    def _upsert(products: List[Dict[str, Any]]) -> None:
+        """Upsert products on sku, each updating only the columns its row has.
+
+        Stock changes are journaled as adjustments; existing rows are locked
+        first, in primary key order like StockService, to read the stock
+        they replace.
+        """
+        previous = dict(Product.objects.filter(
+            sku__in=[product['sku'] for product in products]
+        ).order_by('pk').select_for_update(no_key=True).values_list('pk', 'stock'))
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+        for product in products:
+            groups[tuple(field for field in ProductImportService.FIELDS if field in product)].append(product)
+
+        now = timezone.now()
+        stocks = []
+        for fields, group in groups.items():
+            update_fields = [field for field in fields if field != 'sku']
+            stocks += ProductImportService._upsert_group(group, update_fields, now)
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=pk, quantity=stock - previous.get(pk, 0),
+                kind=StockMovement.Kind.ADJUSTMENT, created_at=now,
+            )
+            for pk, stock in stocks if stock != previous.get(pk, 0)
+        ])
+
+    @staticmethod
+    def _upsert_group(
+        products: List[Dict[str, Any]], update_fields: List[str], now: datetime
+    ) -> List[Tuple[Any, int]]:
+        """One INSERT ... ON CONFLICT (sku) fed by column arrays; returns (id, stock) rows.
+
+        Much cheaper than bulk_create(update_conflicts=True), whose per-value
+        SQL compilation dominated imports of large feeds.
+        """
+        defaults = {'description': '', 'stock': 0, 'is_active': True}
+        columns = [
+            [product.get(field, defaults.get(field)) for product in products]
+            for field in ProductImportService.FIELDS
+        ]
+        table = connection.ops.quote_name(Product._meta.db_table)
+        quote = connection.ops.quote_name
+        updates = ', '.join(
+            f'{quote(field)} = EXCLUDED.{quote(field)}' for field in update_fields + ['updated_at']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(id, sku, name, description, price, stock, is_active, cover_variants, "
+                f"created_at, updated_at) "
+                f"SELECT gen_random_uuid(), sku, name, description, price, stock, is_active, '{{}}', "
+                f"%s, %s "
+                f"FROM unnest(%s::varchar[], %s::varchar[], %s::text[], %s::numeric[], "
+                f"%s::integer[], %s::boolean[]) "
+                f"AS feed (sku, name, description, price, stock, is_active) "
+                f"ON CONFLICT (sku) DO UPDATE SET {updates} "
+                f"RETURNING id, stock",
+                [now, now, *columns],
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def _clean_row(row: Any) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        if not isinstance(row, dict):
+            return {}, {'row': ['Linha inválida.']}
+
+        values: Dict[str, Any] = {}
+        errors: Dict[str, List[str]] = {}
+        for field in ProductImportService.FIELDS:
+            raw = row.get(field)
+            if isinstance(raw, str):
+                raw = raw.strip()
+            if raw is None or raw == '':
+                if field in ProductImportService.REQUIRED_FIELDS:
+                    errors[field] = ['Campo obrigatório.']
+                continue
+            try:
+                values[field] = getattr(ProductImportService, f'_clean_{field}')(raw)
+            except ValueError as e:
+                errors[field] = [str(e)]
+        return values, errors
+
+    @staticmethod
+    def _clean_text(raw: Any, field: str) -> str:
+        value = str(raw)
+        max_length = Product._meta.get_field(field).max_length
+        if max_length and len(value) > max_length:
+            raise ValueError(f'Deve ter no máximo {max_length} caracteres.')
+        return value
+
+    @staticmethod
+    def _clean_sku(raw: Any) -> str:
+        return ProductImportService._clean_text(raw, 'sku')
+
+    @staticmethod
+    def _clean_name(raw: Any) -> str:
+        return ProductImportService._clean_text(raw, 'name')
+
+    @staticmethod
+    def _clean_description(raw: Any) -> str:
+        return str(raw)
+
+    @staticmethod
+    def _clean_price(raw: Any) -> Decimal:
+        try:
+            price = Decimal(str(raw))
+            valid = price.is_finite() and price == price.quantize(Decimal('0.01'))
+        except ArithmeticError:
+            valid = False
+        if not valid:
+            raise ValueError('Preço inválido.')
+        if not Decimal('0.01') <= price < ProductImportService.MAX_PRICE:
+            raise ValueError('Preço fora do intervalo permitido.')
+        return price
+
+    @staticmethod
+    def _clean_stock(raw: Any) -> int:
+        if isinstance(raw, bool):
+            raise ValueError('Estoque inválido.')
+        try:
+            stock = raw if isinstance(raw, int) else int(str(raw))
+        except ValueError:
+            raise ValueError('Estoque inválido.')
+        if not 0 <= stock <= ProductImportService.MAX_STOCK:
+            raise ValueError('Estoque fora do intervalo permitido.')
+        return stock
+
+    @staticmethod
+    def _clean_is_active(raw: Any) -> bool:
+        if isinstance(raw, bool):
+            return raw
+        value = str(raw).lower()
+        if value in ('1', 'true', 't', 'yes', 'sim'):
+            return True
+        if value in ('0', 'false', 'f', 'no', 'não', 'nao'):
+            return False
+        raise ValueError('Valor booleano inválido.')
+
 class SaleAnalyticsService:
     @staticmethod
     def get_sales_by_date_range(start_date: datetime) -> QuerySet[Sale]:
-        return Sale.objects.filter(
+        return Sale.objects.with_user().filter(
             sale_date__gte=start_date
         ).order_by('-sale_date')
 
     @staticmethod
     def group_sales_by_user_and_month(sales: QuerySet[Sale]) -> List[Dict[str, Any]]:
-        grouped: Dict[User, Dict[Tuple[int, int], List[Sale]]] = defaultdict(lambda: defaultdict(list))
-        totals: Dict[User, Dict[Tuple[int, int], Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+        rows = SaleAnalyticsService._monthly_user_totals(sales)
+        return SaleAnalyticsService._group_rows_by_user_and_month(rows, sales)
+
+    @staticmethod
+    def group_sales_by_month_and_user(sales: QuerySet[Sale]) -> List[Dict[str, Any]]:
+        rows = SaleAnalyticsService._monthly_user_totals(sales)
+        return SaleAnalyticsService._group_rows_by_month_and_user(rows, sales)
+
+    @staticmethod
+    def rollup_by_user_and_month(
+        start_month: date, sales: Optional[QuerySet[Sale]] = None
+    ) -> List[Dict[str, Any]]:
+        """Same structure as group_sales_by_user_and_month, read from MonthlySalesRollup"""
+        rows = SaleAnalyticsService._rollup_user_totals(start_month)
+        return SaleAnalyticsService._group_rows_by_user_and_month(
+            rows, sales if sales is not None else Sale.objects.all()
+        )
+
+    @staticmethod
+    def rollup_by_month_and_user(
+        start_month: date, sales: Optional[QuerySet[Sale]] = None
+    ) -> List[Dict[str, Any]]:
+        """Same structure as group_sales_by_month_and_user, read from MonthlySalesRollup"""
+        rows = SaleAnalyticsService._rollup_user_totals(start_month)
+        return SaleAnalyticsService._group_rows_by_month_and_user(
+            rows, sales if sales is not None else Sale.objects.all()
+        )
+
+    @staticmethod
+    def rollup_by_product_and_month(start_month: date) -> QuerySet[MonthlySalesRollup]:
+        return MonthlySalesRollup.objects.filter(
+            month__gte=start_month.replace(day=1)
+        ).values(
+            'month', 'product_id', 'product__name', 'product__sku'
+        ).annotate(
+            total_quantity=models.Sum('quantity'),
+            total_revenue=models.Sum('revenue'),
+        ).order_by('-month', '-total_revenue', 'product_id')
+
+    @staticmethod
+    def _group_rows_by_user_and_month(
+        rows: List[Dict[str, Any]], sales: QuerySet[Sale]
+    ) -> List[Dict[str, Any]]:
+        grouped: Dict[User, Dict[Tuple[int, int], SimpleLazyObject]] = defaultdict(dict)
+        totals: Dict[User, Dict[Tuple[int, int], Decimal]] = defaultdict(dict)
 
-        for sale in sales:
-            year = sale.sale_date.year
-            month = sale.sale_date.month
-            user = sale.user
-            grouped[user][(year, month)].append(sale)
-            totals[user][(year, month)] += sale.total_price
+        users = User.objects.in_bulk({row['user_id'] for row in rows})
+        sales_in_month = SaleAnalyticsService._sales_in_months(sales, rows)
+        # Users with the most recent sales come first, as when iterating sales by -sale_date
+        user_last_sale: Dict[Any, datetime] = {}
+        for row in rows:
+            user_last_sale[row['user_id']] = max(
+                row['last_sale'], user_last_sale.get(row['user_id'], row['last_sale'])
+            )
+        rows.sort(key=lambda row: (user_last_sale[row['user_id']], row['user_id']), reverse=True)
+        for row in rows:
+            user = users[row['user_id']]
+            key = (row['month'].year, row['month'].month)
+            grouped[user][key] = sales_in_month(row)
+            totals[user][key] = row['total']
 
         return SaleAnalyticsService._format_grouped_sales(grouped, totals)
 
     @staticmethod
-    def group_sales_by_month_and_user(sales: QuerySet[Sale]) -> List[Dict[str, Any]]:
-        grouped: Dict[Tuple[int, int], Dict[User, List[Sale]]] = defaultdict(lambda: defaultdict(list))
-        totals: Dict[Tuple[int, int], Dict[User, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    def _group_rows_by_month_and_user(
+        rows: List[Dict[str, Any]], sales: QuerySet[Sale]
+    ) -> List[Dict[str, Any]]:
+        grouped: Dict[Tuple[int, int], Dict[User, SimpleLazyObject]] = defaultdict(dict)
+        totals: Dict[Tuple[int, int], Dict[User, Decimal]] = defaultdict(dict)
 
-        for sale in sales:
-            year = sale.sale_date.year
-            month = sale.sale_date.month
-            user = sale.user
-            grouped[(year, month)][user].append(sale)
-            totals[(year, month)][user] += sale.total_price
+        users = User.objects.in_bulk({row['user_id'] for row in rows})
+        sales_in_month = SaleAnalyticsService._sales_in_months(sales, rows)
+        for row in rows:
+            user = users[row['user_id']]
+            key = (row['month'].year, row['month'].month)
+            grouped[key][user] = sales_in_month(row)
+            totals[key][user] = row['total']
 
         return SaleAnalyticsService._format_grouped_sales_by_month(grouped, totals)
 
+    @staticmethod
+    def _monthly_user_totals(sales: QuerySet[Sale]) -> List[Dict[str, Any]]:
+        """Aggregate totals per user and month in SQL"""
+        return list(
+            sales.order_by()
+            .annotate(month=TruncMonth('sale_date'))
+            .values('user_id', 'month')
+            .annotate(
+                total=models.Sum('total_amount'),
+                last_sale=models.Max('sale_date'),
+            )
+        )
+
+    @staticmethod
+    def _rollup_user_totals(start_month: date) -> List[Dict[str, Any]]:
+        rows = list(
+            MonthlySalesRollup.objects.filter(month__gte=start_month.replace(day=1))
+            .values('user_id', 'month')
+            .annotate(total=models.Sum('revenue'))
+            .order_by()
+        )
+        for row in rows:
+            # The rollup only knows the month, which is enough to order users
+            row['month'] = timezone.make_aware(datetime.combine(row['month'], time.min))
+            row['last_sale'] = row['month']
+        return rows
+
+    @staticmethod
+    def _sales_in_months(
+        sales: QuerySet[Sale], rows: List[Dict[str, Any]]
+    ) -> Callable[[Dict[str, Any]], SimpleLazyObject]:
+        """Lazy lists of the sales behind each aggregated row, as SimpleLazyObjects.
+
+        Nothing is read unless a list is used; the first one read fetches the
+        sales of every row in one go, instead of a query (and its prefetches)
+        per row.
+        """
+        @lru_cache(maxsize=None)
+        def by_row() -> Dict[Tuple[Any, int, int], List[Sale]]:
+            start = min(row['month'] for row in rows)
+            end = (max(row['month'] for row in rows) + timedelta(days=32)).replace(day=1)
+            buckets: Dict[Tuple[Any, int, int], List[Sale]] = defaultdict(list)
+            for sale in sales.filter(
+                user_id__in={row['user_id'] for row in rows}, sale_date__gte=start, sale_date__lt=end
+            ):
+                # Months are local, as TruncMonth made them
+                sale_date = timezone.localtime(sale.sale_date)
+                buckets[(sale.user_id, sale_date.year, sale_date.month)].append(sale)
+            return buckets
+
+        def sales_in_month(row: Dict[str, Any]) -> SimpleLazyObject:
+            key = (row['user_id'], row['month'].year, row['month'].month)
+            return SimpleLazyObject(lambda: by_row().get(key, []))
+
+        return sales_in_month
+
     @staticmethod
     def _format_grouped_sales(
-        grouped: Dict[User, Dict[Tuple[int, int], List[Sale]]],
+        grouped: Dict[User, Dict[Tuple[int, int], SimpleLazyObject]],
         totals: Dict[User, Dict[Tuple[int, int], Decimal]]
     ) -> List[Dict[str, Any]]:
         grouped_sales = []
@@ -121,7 +789,7 @@ class SaleAnalyticsService:
 
     @staticmethod
     def _format_grouped_sales_by_month(
-        grouped: Dict[Tuple[int, int], Dict[User, List[Sale]]],
+        grouped: Dict[Tuple[int, int], Dict[User, SimpleLazyObject]],
         totals: Dict[Tuple[int, int], Dict[User, Decimal]]
     ) -> List[Dict[str, Any]]:
         formatted_sales = []
@@ -140,3 +808,110 @@ class SaleAnalyticsService:
                 })
             formatted_sales.append(month_data)
         return formatted_sales
+
+class SaleExportService:
+    """Sale lines read through a server-side cursor and encoded as they arrive"""
+
+    FIELDS = [
+        'sale_id', 'sale_date', 'user_id', 'username', 'product_id',
+        'product_sku', 'product_name', 'quantity', 'unit_price',
+    ]
+    # Encoded rows are grouped into chunks of about this size before being sent
+    CHUNK_BYTES = 64 * 1024
+
+    @staticmethod
+    def rows(
+        start: Optional[datetime] = None, end: Optional[datetime] = None, chunk_size: int = 2000
+    ) -> Iterator[Tuple[Any, ...]]:
+        """Flat sale lines in sale order, sale_date in [start, end).
+
+        The cursor lives in a transaction so Postgres streams it instead of
+        materialising the whole result for a WITH HOLD cursor.
+        """
+        items = SaleItem.objects.all()
+        if start is not None:
+            items = items.filter(sale__sale_date__gte=start)
+        if end is not None:
+            items = items.filter(sale__sale_date__lt=end)
+        items = items.order_by('sale__sale_date', 'sale_id', 'id').values_list(
+            'sale_id', 'sale__sale_date', 'sale__user_id', 'sale__user__username',
+            'product_id', 'product__sku', 'product__name', 'quantity', 'unit_price',
+        )
+        with transaction.atomic():
+            yield from items.iterator(chunk_size=chunk_size)
+
+    @staticmethod
+    def stream_csv(rows: Iterable[Tuple[Any, ...]]) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(SaleExportService.FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= SaleExportService.CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def stream_ndjson(rows: Iterable[Tuple[Any, ...]]) -> Iterator[str]:
+        encoder = DjangoJSONEncoder()
+        chunk: List[str] = []
+        size = 0
+        for row in rows:
+            line = encoder.encode(dict(zip(SaleExportService.FIELDS, row))) + '\n'
+            chunk.append(line)
+            size += len(line)
+            if size >= SaleExportService.CHUNK_BYTES:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+        yield ''.join(chunk)
+
+class UserImportService:
+    @staticmethod
+    def import_users(
+        rows: Iterable[Dict[str, Any]], workers: int = 1, batch_size: int = 1000
+    ) -> Iterator[Tuple[int, int]]:
+        """Create users in batches, hashing their passwords in a process pool.
+
+        Rows carry username, password and optionally email, first_name and
+        last_name. Existing usernames are skipped before hashing, which is where
+        the time goes. Yields (created, skipped) totals after every batch.
+        """
+        created = skipped = 0
+        rows = iter(rows)
+        with password_hashing_pool(workers) if workers > 1 else nullcontext() as pool:
+            while batch := list(islice(rows, batch_size)):
+                new_rows = UserImportService._new_rows(batch)
+                passwords = hash_passwords([row.get('password') for row in new_rows], pool)
+                User.objects.bulk_create(
+                    [
+                        User(
+                            username=row['username'].strip(),
+                            email=row.get('email') or '',
+                            first_name=row.get('first_name') or '',
+                            last_name=row.get('last_name') or '',
+                            password=password,
+                        )
+                        for row, password in zip(new_rows, passwords)
+                    ],
+                    batch_size=batch_size,
+                    ignore_conflicts=True,
+                )
+
+                created += len(new_rows)
+                skipped += len(batch) - len(new_rows)
+                yield created, skipped
+
+    @staticmethod
+    def _new_rows(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows whose username is neither taken nor repeated earlier in the batch"""
+        rows: Dict[str, Dict[str, Any]] = {}
+        for row in batch:
+            username = (row.get('username') or '').strip()
+            if username:
+                rows.setdefault(username, row)
+        existing = set(
+            User.objects.filter(username__in=rows).values_list('username', flat=True)
+        )
+        return [row for username, row in rows.items() if username not in existing]
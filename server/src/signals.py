@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .authentication import invalidate_user
+from .cache import bump_catalog_version_on_commit
+from .images import schedule_cover_variants, variants_are_stale
+from .models import Product, User
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version_on_commit()
+
+@receiver(post_save, sender=Product)
+def refresh_cover_variants(sender, instance, **kwargs):
+    if variants_are_stale(instance):
+        schedule_cover_variants(instance.pk)
+
+# Token claims and checks that a save can change
+REVOKING_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
+@receiver(pre_save, sender=User)
+def note_revoking_changes(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._revokes_tokens = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        return
+    saved = User.objects.filter(pk=instance.pk).values(*REVOKING_FIELDS).first()
+    instance._revokes_tokens = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in REVOKING_FIELDS
+    )
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance, revoke=getattr(instance, '_revokes_tokens', False))
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    invalidate_user(instance, revoke=True)
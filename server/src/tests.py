@@ -1,3 +1,1514 @@
-from django.test import TestCase
+import os
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+from datetime import date, datetime, timedelta, timezone
+import csv
+import json
+import pstats
+from io import BytesIO, StringIO
+import tempfile
+from importlib import import_module
+from base64 import b64decode
+from urllib.parse import parse_qs, urlparse
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from asgiref.sync import async_to_sync
+from unittest import mock, skipUnless
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .models import MonthlySalesRollup, Product, Sale, SaleItem, StockMovement, User
+from .services import (
+    SaleService, SaleAnalyticsService, SaleExportService, SalesRollupService, ProductImportService,
+    ProductService, StockService, UserImportService,
+)
+from .benchmarking import percentile
+from .cache import get_catalog_version
+from .renderers import ORJSONRenderer
+from .row_serializers import RowSerializer, UnsupportedField
+from .serializers import ProductSearchSerializer, ProductSerializer
+from .tokens import get_bloom_filter, reset_bloom_filter
+from .views import (
+    AsyncProductListCreateAPIView, AsyncProductRetrieveUpdateDestroyAPIView,
+    AsyncSaleListCreateAPIView, AsyncSaleRetrieveAPIView,
+)
 
-# Create your tests here.
+class SaleQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='', price=Decimal('10.50'),
+                sku=f'SKU-{i}', stock=100,
+            )
+            for i in range(3)
+        ]
+
+    def create_sales(self, count: int) -> None:
+        for _ in range(count):
+            SaleService.create_sale(self.user, [
+                SaleItem(product=product, quantity=2) for product in self.products
+            ])
+
+    def count_list_queries(self) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('sale-list-create'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_sale_list_query_count_is_constant(self):
+        self.create_sales(1)
+        baseline = self.count_list_queries()
+        self.create_sales(20)
+        self.assertEqual(self.count_list_queries(), baseline)
+
+    def test_sale_list_total_price_is_annotated(self):
+        self.create_sales(1)
+        response = self.client.get(reverse('sale-list-create'))
+        sale = response.data['results'][0]
+        self.assertEqual(sale['total_price'], '63.00')
+        self.assertEqual(len(sale['items']), 3)
+
+    def test_sale_detail_query_count(self):
+        self.create_sales(1)
+        sale = Sale.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('sale-detail', args=[sale.pk]))
+        self.assertEqual(response.data['total_price'], '63.00')
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Sale.objects.bulk_create(Sale(user=self.user) for _ in range(7))
+
+    def test_walks_every_sale_once(self):
+        seen = []
+        url = reverse('sale-list-create') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(sale['id'] for sale in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_page_size_is_capped(self):
+        Sale.objects.bulk_create(Sale(user=self.user) for _ in range(200))
+        response = self.client.get(reverse('sale-list-create') + '?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 200)
+
+    def test_rows_tying_on_the_leading_column_are_paged_by_keyset(self):
+        # As an import leaves them: one created_at for the whole batch
+        Product.objects.bulk_create(
+            Product(name=f'Item {n}', description='', price=Decimal('1.00'), sku=f'TIE-{n}')
+            for n in range(1300)
+        )
+        Product.objects.update(created_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        seen = []
+        url = reverse('product-list-create') + '?page_size=200'
+        while url:
+            response = self.client.get(url)
+            seen.extend(product['id'] for product in response.data['results'])
+            url = response.data['next']
+            if url:
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                self.assertNotIn('o=', b64decode(cursor).decode())
+        self.assertEqual(len(seen), 1300)
+        self.assertEqual(len(set(seen)), 1300)
+
+        previous = self.client.get(response.data['previous']).data['results']
+        self.assertEqual([product['id'] for product in previous], seen[-300:-100])
+
+class BulkSaleCreationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='', price=Decimal('5.00'),
+                sku=f'SKU-{i}', stock=10,
+            )
+            for i in range(5)
+        ]
+
+    def test_create_sale_query_count_does_not_grow_with_items(self):
+        items = [SaleItem(product=product, quantity=2) for product in self.products]
+        # savepoint, price lookup, insert sale, insert items, rollup upsert,
+        # stock ledger write, release
+        with self.assertNumQueries(7):
+            SaleService.create_sale(self.user, items)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 8)
+
+    def test_stock_is_locked_in_primary_key_order(self):
+        # Items listed against pk order: the lock must not follow the scan order
+        products = sorted(self.products, key=lambda product: product.pk, reverse=True)
+        with CaptureQueriesContext(connection) as ctx:
+            SaleService.create_sales([
+                (Sale(user=self.user), [SaleItem(product=product, quantity=1) for product in products]),
+                (Sale(user=self.user), [SaleItem(product=products[0], quantity=1)]),
+            ])
+        locks = [q['sql'] for q in ctx.captured_queries if 'FOR NO KEY UPDATE' in q['sql']]
+        self.assertEqual(len(locks), 1)
+        self.assertIn('ORDER BY id FOR NO KEY UPDATE', locks[0])
+
+    def test_insufficient_stock_rolls_back_every_sale(self):
+        response = self.client.post(reverse('sale-bulk-create'), [
+            {'items': [{'product_id': str(self.products[0].pk), 'quantity': 6}]},
+            {'items': [{'product_id': str(self.products[0].pk), 'quantity': 6}]},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 10)
+
+    @override_settings(SALES_BULK_MAX=2, SALES_BULK_MAX_ITEMS=5)
+    def test_bulk_endpoint_limits_the_batch(self):
+        order = {'items': [{'product_id': str(self.products[0].pk), 'quantity': 1}]}
+        response = self.client.post(reverse('sale-bulk-create'), [order] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        large = {'items': [
+            {'product_id': str(product.pk), 'quantity': 1} for product in self.products
+        ] * 2}
+        response = self.client.post(reverse('sale-bulk-create'), [large], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 5 items', response.data['items'])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_bulk_endpoint_creates_sales(self):
+        response = self.client.post(reverse('sale-bulk-create'), [
+            {'items': [{'product_id': str(product.pk), 'quantity': 1} for product in self.products]},
+            {
+                'sale_date': '2025-01-15T10:00:00Z',
+                'items': [{'product_id': str(self.products[0].pk), 'quantity': 3}],
+            },
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(SaleItem.objects.count(), 6)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 6)
+
+class SaleCreateAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            name='Mouse', description='', price=Decimal('25.00'), sku='MOU-1', stock=5,
+        )
+
+    def test_post_creates_items_and_decrements_stock(self):
+        response = self.client.post(reverse('sale-list-create'), {
+            'items': [{'product_id': str(self.product.pk), 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], '50.00')
+        self.assertEqual(response.data['user']['username'], 'seller')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_post_rejects_overselling(self):
+        response = self.client.post(reverse('sale-list-create'), {
+            'items': [{'product_id': str(self.product.pk), 'quantity': 6}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Estoque insuficiente', response.data['items'][0])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_post_rejects_unknown_products(self):
+        response = self.client.post(reverse('sale-list-create'), {
+            'items': [{'product_id': '00000000-0000-0000-0000-000000000000', 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Produto não encontrado', response.data['items'][0])
+
+    def test_post_query_count_does_not_grow_with_items(self):
+        products = [self.product] + [
+            Product.objects.create(
+                name=f'Item {n}', description='', price=Decimal('1.00'), sku=f'ITM-{n}', stock=5,
+            )
+            for n in range(4)
+        ]
+
+        def post(items):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(reverse('sale-list-create'), {
+                    'items': [{'product_id': str(product.pk), 'quantity': 1} for product in items],
+                }, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data['items']), len(items))
+            return len(ctx.captured_queries)
+
+        single = post(products[:1])
+        with self.assertNumQueries(single):
+            post(products)
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_single_sku_is_never_oversold(self):
+        user = User.objects.create_user(username='seller', password='secret123')
+        product = Product.objects.create(
+            name='Hot item', description='', price=Decimal('1.00'), sku='HOT-1', stock=10,
+        )
+
+        def checkout(_):
+            try:
+                SaleService.create_sale(user, [SaleItem(product_id=product.pk, quantity=1)])
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(checkout, range(30)))
+
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(SaleItem.objects.count(), 10)
+
+    def test_multi_product_sales_in_opposite_orders_do_not_deadlock(self):
+        user = User.objects.create_user(username='seller', password='secret123')
+        first, second = [
+            Product.objects.create(
+                name=f'Item {n}', description='', price=Decimal('1.00'), sku=f'HOT-{n}', stock=100,
+            )
+            for n in range(2)
+        ]
+
+        def checkout(n):
+            products = [first, second] if n % 2 else [second, first]
+            try:
+                SaleService.create_sale(user, [SaleItem(product_id=p.pk, quantity=1) for p in products])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(checkout, range(40)))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (60, 60))
+
+class SaleTotalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.product = Product.objects.create(
+            name='Monitor', description='', price=Decimal('100.00'), sku='MON-1', stock=10,
+        )
+
+    def test_total_survives_price_changes(self):
+        sale = SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=3)])
+        self.product.price = Decimal('150.00')
+        self.product.save()
+
+        sale = Sale.objects.get(pk=sale.pk)
+        self.assertEqual(sale.total_amount, Decimal('300.00'))
+        self.assertEqual(sale.items.get().unit_price, Decimal('100.00'))
+
+    def test_recompute_totals_in_chunks(self):
+        for _ in range(5):
+            SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=1)])
+        Sale.objects.update(total_amount=0)
+
+        progress = list(SaleService.recompute_totals(chunk_size=2))
+
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertFalse(Sale.objects.exclude(total_amount=Decimal('100.00')).exists())
+
+    def test_serializes_totals_the_column_can_hold(self):
+        Sale.objects.create(user=self.user, total_amount=Decimal('123456789.00'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('sale-list-create'))
+        self.assertEqual(response.data['results'][0]['total_price'], '123456789.00')
+
+class SaleAnalyticsTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='secret123')
+        self.bob = User.objects.create_user(username='bob', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.product = Product.objects.create(
+            name='Cable', description='', price=Decimal('0.50'), sku='CAB-1', stock=1000,
+        )
+        SaleService.create_sales([
+            (
+                Sale(user=user, sale_date=datetime(2025, month, day, 12, tzinfo=timezone.utc)),
+                [SaleItem(product=self.product, quantity=quantity)],
+            )
+            for user, day, month, quantity in [
+                (self.alice, 3, 1, 20), (self.alice, 20, 1, 10),
+                (self.alice, 2, 2, 15), (self.bob, 28, 2, 2),
+            ]
+        ])
+        self.sales = Sale.objects.all().order_by('-sale_date')
+
+    def test_group_by_user_and_month(self):
+        with self.assertNumQueries(2):
+            grouped = SaleAnalyticsService.group_sales_by_user_and_month(self.sales)
+
+        self.assertEqual([group['user'] for group in grouped], [self.bob, self.alice])
+        alice_months = grouped[1]['months']
+        self.assertEqual([(m['year'], m['month']) for m in alice_months], [(2025, 2), (2025, 1)])
+        self.assertEqual(alice_months[1]['total'], Decimal('15.00'))
+        self.assertEqual(len(alice_months[1]['sales']), 2)
+
+    def test_group_by_month_and_user(self):
+        with self.assertNumQueries(2):
+            grouped = SaleAnalyticsService.group_sales_by_month_and_user(self.sales)
+
+        self.assertEqual([(m['year'], m['month']) for m in grouped], [(2025, 2), (2025, 1)])
+        february = grouped[0]['user_sales']
+        self.assertEqual([entry['user'] for entry in february], [self.alice, self.bob])
+        self.assertEqual(february[0]['total'], Decimal('7.50'))
+
+    def test_rollup_is_maintained_incrementally(self):
+        incremental = set(MonthlySalesRollup.objects.values_list(
+            'month', 'user_id', 'product_id', 'quantity', 'revenue'
+        ))
+        SalesRollupService.rebuild()
+        rebuilt = set(MonthlySalesRollup.objects.values_list(
+            'month', 'user_id', 'product_id', 'quantity', 'revenue'
+        ))
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(
+            MonthlySalesRollup.objects.get(user=self.alice, month=date(2025, 1, 1)).revenue,
+            Decimal('15.00'),
+        )
+
+    def test_migration_backfills_existing_sales(self):
+        incremental = set(MonthlySalesRollup.objects.values_list(
+            'month', 'user_id', 'product_id', 'quantity', 'revenue'
+        ))
+        MonthlySalesRollup.objects.all().delete()
+        migration = import_module('src.migrations.0004_monthly_sales_rollup')
+        with connection.schema_editor() as schema_editor:
+            migration.backfill_rollup(django_apps, schema_editor)
+        backfilled = set(MonthlySalesRollup.objects.values_list(
+            'month', 'user_id', 'product_id', 'quantity', 'revenue'
+        ))
+        self.assertEqual(incremental, backfilled)
+
+    def test_rollup_matches_sales_grouping(self):
+        from_sales = SaleAnalyticsService.group_sales_by_month_and_user(self.sales)
+        from_rollup = SaleAnalyticsService.rollup_by_month_and_user(date(2025, 1, 1))
+        self.assertEqual(
+            [[(e['user'], e['total']) for e in m['user_sales']] for m in from_sales],
+            [[(e['user'], e['total']) for e in m['user_sales']] for m in from_rollup],
+        )
+
+    def test_analytics_endpoint(self):
+        url = reverse('sale-analytics') + '?start=2025-01-01&group_by=month'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('sales', response.data[0]['user_sales'][0])
+
+        response = self.client.get(url + '&include_sales=true')
+        self.assertEqual(len(response.data[1]['user_sales'][0]['sales']), 2)
+
+    def test_analytics_sales_are_fetched_once_for_every_group(self):
+        url = reverse('sale-analytics') + '?start=2025-01-01&include_sales=true'
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        carol = User.objects.create_user(username='carol', password='secret123')
+        SaleService.create_sales([
+            (
+                Sale(user=carol, sale_date=datetime(2025, month, 5, 12, tzinfo=timezone.utc)),
+                [SaleItem(product=self.product, quantity=1)],
+            )
+            for month in (1, 2, 3)
+        ])
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            response = self.client.get(url)
+        self.assertEqual(
+            [(len(month['sales']), month['month']) for month in response.data[0]['months']],
+            [(1, 3), (1, 2), (1, 1)],
+        )
+
+    def test_product_analytics_endpoint(self):
+        response = self.client.get(reverse('product-analytics') + '?start=2025-01-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['month'], row['quantity'], row['revenue']) for row in response.data['results']],
+            [('2025-02-01', 17, '8.50'), ('2025-01-01', 30, '15.00')],
+        )
+
+    def test_product_analytics_pages_ties_by_keyset(self):
+        products = Product.objects.bulk_create(
+            Product(name=f'Item {n}', description='', price=Decimal('1.00'), sku=f'TIE-{n}')
+            for n in range(5)
+        )
+        MonthlySalesRollup.objects.bulk_create(
+            MonthlySalesRollup(
+                month=date(2025, 1, 1), user=self.alice, product=product, quantity=1, revenue=Decimal('1.00'),
+            )
+            for product in products
+        )
+        seen = []
+        url = reverse('product-analytics') + '?start=2025-01-01&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend((row['month'], row['product_id']) for row in response.data['results'])
+            url = response.data['next']
+            if url:
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                self.assertNotIn('o=', b64decode(cursor).decode())
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.mouse = Product.objects.create(
+            name='Logitech Wireless Mouse', description='', price=Decimal('20.00'),
+            sku='MOU-LOG-100', stock=10,
+        )
+        self.keyboard = Product.objects.create(
+            name='Mechanical Keyboard', description='', price=Decimal('80.00'),
+            sku='KEY-MEC-200', stock=10,
+        )
+        SaleService.create_sale(self.user, [SaleItem(product=self.mouse, quantity=3)])
+
+    def test_stats_come_from_rollup(self):
+        products = {p.pk: p for p in ProductService.get_products_with_stats()}
+        self.assertEqual(products[self.mouse.pk].total_revenue, Decimal('60.00'))
+        self.assertEqual(products[self.mouse.pk].total_sold, 3)
+        self.assertEqual(products[self.keyboard.pk].total_revenue, Decimal('0'))
+        self.assertEqual(products[self.keyboard.pk].total_sold, 0)
+
+    def test_search_endpoint_ranks_matches(self):
+        response = self.client.get(reverse('product-search') + '?q=wireles mouse')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['sku'] for r in results], ['MOU-LOG-100'])
+        self.assertEqual(results[0]['total_sold'], 3)
+
+    def test_search_matches_description_and_prefixes(self):
+        self.keyboard.description = 'Switches azuis com retroiluminação'
+        self.keyboard.save()
+
+        by_description = ProductService.search_products('retroilumin')
+        self.assertEqual(list(by_description), [self.keyboard])
+        by_prefix = ProductService.search_products('mech key')
+        self.assertEqual(list(by_prefix), [self.keyboard])
+
+    def test_search_falls_back_to_trigrams_for_typos(self):
+        self.assertEqual(list(ProductService.search_products('Logitehc Wireles Mouse')), [self.mouse])
+
+    def test_search_requires_query(self):
+        response = self.client.get(reverse('product-search'))
+        self.assertEqual(response.status_code, 400)
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            name='Webcam', description='', price=Decimal('30.00'), sku='CAM-1', stock=4,
+        )
+
+    def test_repeated_reads_skip_the_database(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        url = reverse('product-list-create')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_product_write_invalidates(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'name': 'HD Webcam'}, format='json')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'HD Webcam')
+
+    def test_sale_invalidates_stock(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=1)])
+        self.assertEqual(self.client.get(url).data['stock'], 3)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_redis_backend(self):
+        redis_caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost:6379/0',
+                'OPTIONS': {'connection_class': fakeredis.FakeConnection},
+            }
+        }
+        with override_settings(CACHES=redis_caches):
+            caches['default'].clear()
+            url = reverse('product-detail', args=[self.product.pk])
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.data['sku'], 'CAM-1')
+
+# Stands in for the shared users cache; one process sees its own LocMemCache
+@override_settings(USER_CACHE_ALIAS='default')
+class StatelessAuthenticationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(
+            username='seller', password='secret123', email='seller@example.com'
+        )
+        response = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        })
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_authenticated_get_makes_no_auth_queries(self):
+        Sale.objects.create(user=self.user)
+        # Only the sale page and its prefetched items
+        with self.assertNumQueries(2):
+            response = self.api.get(reverse('sale-list-create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_full_user_is_cached(self):
+        self.api.get(reverse('user-info'))
+        with self.assertNumQueries(0):
+            response = self.api.get(reverse('user-info'))
+        self.assertEqual(response.data['email'], 'seller@example.com')
+
+    def test_profile_change_invalidates_cached_user(self):
+        self.api.get(reverse('user-info'))
+        self.api.patch(reverse('user-profile'), {'first_name': 'Ana'}, format='json')
+        self.assertEqual(self.api.get(reverse('user-info')).data['first_name'], 'Ana')
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.api.get(reverse('sale-list-create'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_demoted_staff_loses_staff_rights(self):
+        self.user.is_staff = True
+        self.user.save()
+        staff_token = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        }).data['access']
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {staff_token}')
+        self.assertEqual(self.api.get(reverse('user-list')).status_code, 200)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.api.get(reverse('user-list')).status_code, 403)
+        self.assertEqual(self.api.get(reverse('sale-list-create')).status_code, 200)
+
+    def test_deleted_user_is_rejected(self):
+        self.api.get(reverse('user-info'))
+        self.user.delete()
+        for name in ('user-info', 'user-profile', 'sale-list-create'):
+            self.assertEqual(self.api.get(reverse(name)).status_code, 401)
+
+    def test_profile_update_starts_from_the_current_row(self):
+        self.api.get(reverse('user-profile'))
+        # Changed without signals, so the cached copy is stale
+        User.objects.filter(pk=self.user.pk).update(password='changed-elsewhere')
+        self.api.patch(reverse('user-profile'), {'first_name': 'Ana'}, format='json')
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.password), ('Ana', 'changed-elsewhere'))
+
+    def test_sale_is_created_for_token_user(self):
+        product = Product.objects.create(
+            name='Pen', description='', price=Decimal('2.00'), sku='PEN-1', stock=3,
+        )
+        response = self.api.post(reverse('sale-list-create'), {
+            'items': [{'product_id': str(product.pk), 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.get().user, self.user)
+
+@override_settings(USER_CACHE_ALIAS=None)
+class DatabaseAuthenticationTests(TestCase):
+    """Without a shared users cache, every worker checks the user row"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        response = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        })
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_deactivation_is_seen_without_a_cache(self):
+        self.assertEqual(self.api.get(reverse('user-info')).status_code, 200)
+        # As done by another worker, whose cache this one can't see
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.api.get(reverse('user-info')).status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.user.delete()
+        self.assertEqual(self.api.get(reverse('sale-list-create')).status_code, 401)
+
+    def test_demotion_is_seen_without_a_cache(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        staff_token = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        }).data['access']
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {staff_token}')
+        self.assertEqual(self.api.get(reverse('user-list')).status_code, 200)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertEqual(self.api.get(reverse('user-list')).status_code, 403)
+
+@override_settings(JWT_BLACKLIST_BLOOM_BACKEND='local')
+class RefreshTokenBlacklistTests(TestCase):
+    def setUp(self):
+        reset_bloom_filter()
+        self.addCleanup(reset_bloom_filter)
+        User.objects.create_user(username='seller', password='secret123')
+        self.refresh = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        }).data['refresh']
+
+    def refresh_token(self, token: str):
+        return self.client.post(reverse('token-refresh'), {'refresh': token})
+
+    def test_rotated_token_cannot_be_reused(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_blacklist_check_skips_the_table(self):
+        get_bloom_filter().load()
+        with CaptureQueriesContext(connection) as ctx:
+            self.refresh_token(self.refresh)
+        jti_lookups = [
+            q['sql'] for q in ctx.captured_queries
+            if 'INNER JOIN "token_blacklist_outstandingtoken"' in q['sql']
+        ]
+        self.assertEqual(jti_lookups, [])
+
+    def test_blacklist_survives_a_cold_filter(self):
+        self.refresh_token(self.refresh)
+        reset_bloom_filter()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_logout_blacklists(self):
+        access = self.refresh_token(self.refresh).data['access']
+        other = self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        }).data['refresh']
+        self.client.post(
+            reverse('logout'), {'refresh': other}, HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+        self.assertEqual(self.refresh_token(other).status_code, 401)
+
+    def test_flush_expired_tokens_in_batches(self):
+        self.refresh_token(self.refresh)
+        OutstandingToken.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(days=1))
+
+        out = StringIO()
+        call_command('flush_expired_tokens', batch_size=1, stdout=out)
+
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertIn('Successfully flushed 1 expired tokens', out.getvalue())
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_redis_bloom_filter(self):
+        redis_caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost:6379/1',
+                'OPTIONS': {'connection_class': fakeredis.FakeConnection},
+            }
+        }
+        with override_settings(CACHES=redis_caches, JWT_BLACKLIST_BLOOM_BACKEND='redis'):
+            reset_bloom_filter()
+            get_bloom_filter().rebuild()
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 200)
+            self.assertTrue(get_bloom_filter().might_contain(
+                OutstandingToken.objects.get().jti
+            ))
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_redis_bloom_filter_reloads_after_eviction(self):
+        redis_caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost:6379/2',
+                'OPTIONS': {'connection_class': fakeredis.FakeConnection},
+            }
+        }
+        with override_settings(CACHES=redis_caches, JWT_BLACKLIST_BLOOM_BACKEND='redis'):
+            reset_bloom_filter()
+            self.refresh_token(self.refresh)
+            bloom = get_bloom_filter()
+            bloom.rebuild()
+            bloom.store.client.delete(bloom.store.key)
+
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+            self.assertEqual(bloom.store.client.keys('*building*'), [])
+
+    def test_rebuild_keeps_tokens_blacklisted_meanwhile(self):
+        bloom = get_bloom_filter()
+        bloom.load()
+        replace = bloom.store.replace
+
+        def blacklist_during_rebuild(batches):
+            batches = list(batches)
+            self.refresh_token(self.refresh)
+            replace(batches)
+
+        with mock.patch.object(bloom.store, 'replace', blacklist_during_rebuild):
+            bloom.rebuild()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+class PasswordHashingTests(TestCase):
+    def login(self):
+        return self.client.post(reverse('token-obtain-pair'), {
+            'username': 'seller', 'password': 'secret123',
+        })
+
+    def test_login_rehashes_legacy_passwords(self):
+        User.objects.create(
+            username='seller', password=make_password('secret123', hasher='pbkdf2_sha256')
+        )
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(User.objects.get().password.startswith('argon2$'))
+
+    def test_login_rehashes_after_cost_change(self):
+        User.objects.create_user(username='seller', password='secret123')
+        with override_settings(PASSWORD_ARGON2_TIME_COST=3):
+            self.assertEqual(self.login().status_code, 200)
+        self.assertIn(',t=3,', User.objects.get().password)
+
+    def test_bulk_import_hashes_in_a_pool(self):
+        User.objects.create_user(username='taken', password='secret123')
+        rows = [
+            {'username': 'ana', 'password': 'pass-ana', 'email': 'ana@example.com'},
+            {'username': 'bia', 'password': 'pass-bia'},
+            {'username': 'ana', 'password': 'duplicate'},
+            {'username': 'taken', 'password': 'other'},
+            {'username': 'sem-senha', 'password': None},
+        ]
+        progress = list(UserImportService.import_users(rows, workers=2, batch_size=3))
+
+        self.assertEqual(progress, [(2, 1), (3, 2)])
+        users = User.objects.in_bulk(field_name='username')
+        self.assertTrue(users['ana'].check_password('pass-ana'))
+        self.assertEqual(users['ana'].email, 'ana@example.com')
+        self.assertTrue(users['bia'].check_password('pass-bia'))
+        self.assertTrue(users['taken'].check_password('secret123'))
+        self.assertFalse(users['sem-senha'].has_usable_password())
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            name='Teclado', description='', price=Decimal('20.00'), sku='KEY-1', stock=50,
+        )
+        for _ in range(3):
+            SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=2)])
+
+    def call(self, view_class, method, path, data=None, **kwargs):
+        request = getattr(APIRequestFactory(), method)(path, data, format='json')
+        force_authenticate(request, self.user)
+        return async_to_sync(view_class.as_view())(request, **kwargs)
+
+    def test_sale_list_matches_sync_view(self):
+        url = reverse('sale-list-create') + '?page_size=2'
+        expected = self.client.get(url).data
+        # Sales page and its prefetched items, with the async ORM
+        with self.assertNumQueries(2):
+            response = self.call(AsyncSaleListCreateAPIView, 'get', url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, expected)
+
+        next_page = self.call(AsyncSaleListCreateAPIView, 'get', response.data['next'])
+        self.assertEqual(next_page.data, self.client.get(expected['next']).data)
+
+    @override_settings(FAST_SERIALIZATION=True)
+    def test_sale_list_fast_path(self):
+        url = reverse('sale-list-create') + '?expand=&page_size=2'
+        expected = self.client.get(url)
+        response = self.call(AsyncSaleListCreateAPIView, 'get', url)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.render().content, expected.content)
+
+    def test_sale_detail(self):
+        sale = Sale.objects.first()
+        url = reverse('sale-detail', args=[sale.pk])
+        response = self.call(AsyncSaleRetrieveAPIView, 'get', url, pk=sale.pk)
+        self.assertEqual(response.data, self.client.get(url).data)
+
+        missing = self.call(AsyncSaleRetrieveAPIView, 'get', url, pk=self.product.pk)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_product_reads_are_cached(self):
+        url = reverse('product-list-create')
+        first = self.call(AsyncProductListCreateAPIView, 'get', url)
+        with self.assertNumQueries(0):
+            second = self.call(AsyncProductListCreateAPIView, 'get', url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_writes_go_through_the_sync_path(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        response = self.call(
+            AsyncProductRetrieveUpdateDestroyAPIView, 'patch', url, {'stock': 7}, pk=self.product.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+        response = self.call(
+            AsyncSaleListCreateAPIView, 'post', reverse('sale-list-create'),
+            {'items': [{'product_id': str(self.product.pk), 'quantity': 1}]},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.filter(user=self.user).count(), 4)
+
+class SaleExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            name='Caneta, azul', description='', price=Decimal('2.50'), sku='PEN-1', stock=100,
+        )
+        for day, quantity in [(1, 1), (15, 2), (31, 3)]:
+            SaleService.create_sales([(
+                Sale(user=self.user, sale_date=datetime(2025, 1, day, 23, 30, tzinfo=timezone.utc)),
+                [SaleItem(product=self.product, quantity=quantity)],
+            )])
+
+    def export(self, query: str):
+        response = self.client.get(reverse('sale-export') + query)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export_between_dates(self):
+        response, body = self.export('?format=csv&from=2025-01-15&to=2025-01-31')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row['quantity'] for row in rows], ['2', '3'])
+        self.assertEqual(rows[0]['product_name'], 'Caneta, azul')
+        self.assertEqual(rows[0]['username'], 'seller')
+        self.assertEqual(rows[0]['unit_price'], '2.50')
+
+    def test_ndjson_export(self):
+        _, body = self.export('?format=ndjson')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([line['quantity'] for line in lines], [1, 2, 3])
+        self.assertEqual(lines[0]['unit_price'], '2.50')
+        self.assertEqual(lines[0]['product_id'], str(self.product.pk))
+
+    def test_large_exports_are_sent_in_chunks(self):
+        with mock.patch.object(SaleExportService, 'CHUNK_BYTES', 100):
+            response = self.client.get(reverse('sale-export') + '?format=ndjson')
+            self.assertGreater(len(list(response.streaming_content)), 1)
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get(reverse('sale-export') + '?format=xml').status_code, 400)
+        self.assertEqual(self.client.get(reverse('sale-export') + '?from=15/01').status_code, 400)
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.existing = Product.objects.create(
+            name='Mouse', description='Sem fio', price=Decimal('50.00'), sku='MOU-1', stock=8,
+        )
+
+    def import_csv(self, content: str, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            feed.write(content)
+        self.addCleanup(os.remove, feed.name)
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_products', feed.name, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_command_upserts_on_sku_and_reports_bad_rows(self):
+        version = get_catalog_version()
+        out, err = self.import_csv(
+            'sku,name,price,stock\n'
+            'MOU-1,Mouse Pro,55.90,3\n'
+            'KEY-1,Teclado,120.00,10\n'
+            'BAD-1,,abc,-1\n'
+            'KEY-1,Teclado ABNT,125.00,12\n',
+            batch_size=2,
+        )
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price), ('Mouse Pro', Decimal('55.90')))
+        self.assertEqual(self.existing.description, 'Sem fio')
+        keyboard = Product.objects.get(sku='KEY-1')
+        self.assertEqual((keyboard.name, keyboard.stock, keyboard.description), ('Teclado ABNT', 12, ''))
+        self.assertTrue(Product.objects.filter(search_vector='abnt').exists())
+        self.assertFalse(Product.objects.filter(sku='BAD-1').exists())
+
+        self.assertIn('Line 4: name: Campo obrigatório.; price: Preço inválido.; stock:', err)
+        self.assertIn('Successfully upserted 3 products from 4 rows, 1 rejected', out)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_endpoint_requires_admin(self):
+        admin = User.objects.create_user(username='admin', password='secret123', is_staff=True)
+        seller = User.objects.create_user(username='seller', password='secret123')
+        client = APIClient()
+        feed = (
+            '{"sku": "MOU-1", "name": "Mouse", "price": "49.90"}\n'
+            '{"sku": "CAM-1", "name": "Webcam", "price": 80, "stock": 5, "is_active": false}\n'
+            'not json\n'
+        )
+
+        client.force_authenticate(seller)
+        upload = SimpleUploadedFile('feed.ndjson', feed.encode())
+        response = client.post(reverse('product-import'), {'file': upload})
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(admin)
+        upload = SimpleUploadedFile('feed.ndjson', feed.encode())
+        response = client.post(reverse('product-import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['upserted'], 2)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'errors': {'row': ['Linha inválida.']}}])
+
+        self.existing.refresh_from_db()
+        # Columns missing from the feed keep their values
+        self.assertEqual((self.existing.price, self.existing.stock), (Decimal('49.90'), 8))
+        webcam = Product.objects.get(sku='CAM-1')
+        self.assertEqual((webcam.stock, webcam.is_active), (5, False))
+
+    def test_rows_only_update_the_columns_they_have(self):
+        keyboard = Product.objects.create(
+            name='Teclado', description='ABNT', price=Decimal('99.00'), sku='KEY-1', stock=4,
+            is_active=False,
+        )
+        list(ProductImportService.import_products([
+            (1, {'sku': 'MOU-1', 'name': 'Mouse', 'price': '50.00', 'stock': 3}),
+            (2, {'sku': 'KEY-1', 'name': 'Teclado', 'price': '95.00', 'description': 'ABNT2'}),
+            (3, {'sku': 'CAM-1', 'name': 'Webcam', 'price': '80.00', 'description': 'HD', 'is_active': False}),
+        ]))
+
+        keyboard.refresh_from_db()
+        self.assertEqual(
+            (keyboard.price, keyboard.stock, keyboard.description, keyboard.is_active),
+            (Decimal('95.00'), 4, 'ABNT2', False),
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.stock, self.existing.description), (3, 'Sem fio'))
+        webcam = Product.objects.get(sku='CAM-1')
+        self.assertEqual((webcam.description, webcam.stock, webcam.is_active), ('HD', 0, False))
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='secret123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('product-list-create'), {
+            'name': 'Mouse', 'description': 'Sem fio', 'price': '25.00', 'sku': 'MOU-1', 'stock': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.product = Product.objects.get(sku='MOU-1')
+
+    def movements(self):
+        return list(self.product.stock_movements.order_by('id').values_list('kind', 'quantity'))
+
+    def test_sales_and_adjustments_are_journaled(self):
+        SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=3)])
+        response = self.client.patch(
+            reverse('product-detail', args=[self.product.pk]), {'stock': 20, 'name': 'Mouse Pro'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 20)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.stock), ('Mouse Pro', 20))
+        self.assertEqual(self.movements(), [('restock', 10), ('sale', -3), ('adjustment', 13)])
+        self.assertEqual(StockMovement.objects.filter(kind='sale').get().sale.total_amount, Decimal('75.00'))
+        self.assertFalse(StockService.drifted().exists())
+
+    def test_update_without_stock_keeps_concurrent_sales(self):
+        # The serializer's instance predates the sale, as with a concurrent request
+        stale = Product.objects.get(pk=self.product.pk)
+        SaleService.create_sale(self.user, [SaleItem(product=self.product, quantity=4)])
+        serializer = ProductSerializer(stale, data={'price': '30.00'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.price, self.product.stock), (Decimal('30.00'), 6))
+
+    def test_import_journals_stock_changes(self):
+        rows = [(1, {'sku': 'MOU-1', 'name': 'Mouse', 'price': '25.00', 'stock': 7}),
+                (2, {'sku': 'KEY-1', 'name': 'Teclado', 'price': '99.00', 'stock': 5})]
+        list(ProductImportService.import_products(rows))
+        self.assertEqual(self.movements(), [('restock', 10), ('adjustment', -3)])
+        self.assertEqual(
+            list(StockMovement.objects.filter(product__sku='KEY-1').values_list('kind', 'quantity')),
+            [('adjustment', 5)],
+        )
+        self.assertFalse(StockService.drifted().exists())
+
+    def test_reconcile_resets_drifted_stock(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=15)
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('MOU-1: stock 15, ledger 10 (+5)', out.getvalue())
+        self.assertIn('1 products drifted', out.getvalue())
+
+        call_command('reconcile_stock', fix=True, stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(StockService.drifted().exists())
+
+    def test_reconcile_locks_products_batch_by_batch(self):
+        other = Product.objects.create(
+            name='Teclado', description='', price=Decimal('80.00'), sku='KEY-1'
+        )
+        StockService.set_stock(other.pk, 4)
+        Product.objects.update(stock=F('stock') + 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(StockService.reconcile(batch_size=1), 2)
+        locks = [q['sql'] for q in ctx.captured_queries if 'FOR NO KEY UPDATE' in q['sql']]
+        self.assertEqual(len(locks), 3)
+        self.assertFalse(any('LOCK TABLE' in q['sql'] for q in ctx.captured_queries))
+        self.assertFalse(StockService.drifted().exists())
+
+class CoverImageTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, COVER_IMAGE_WORKERS=0, MEDIA_ACCEL_REDIRECT=''
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            name='Monitor', description='27"', price=Decimal('1500.00'), sku='MON-1', stock=3,
+        )
+
+    def upload_cover(self, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('product-detail', args=[self.product.pk]),
+                {'cover_image': upload}, format='multipart',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+
+    def test_upload_generates_resized_variants(self):
+        self.upload_cover()
+
+        name = self.product.cover_image.name
+        self.assertRegex(name, r'^product_covers/[0-9a-f]{32}\.png$')
+        base = os.path.splitext(name)[0]
+        self.assertEqual(self.product.cover_variants, {
+            size: {ext: f'{base}/{size}.{ext}' for ext in ('webp', 'jpeg')}
+            for size in ('detail', 'thumb')
+        })
+        with default_storage.open(self.product.cover_variants['thumb']['webp']) as variant:
+            with Image.open(variant) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (320, 160)))
+        with default_storage.open(self.product.cover_variants['detail']['jpeg']) as variant:
+            with Image.open(variant) as image:
+                self.assertEqual((image.format, image.size), ('JPEG', (1200, 600)))
+
+        response = self.client.get(reverse('product-detail', args=[self.product.pk]))
+        self.assertTrue(
+            response.data['cover_variants']['thumb']['webp'].endswith(f'/media/{base}/thumb.webp')
+        )
+
+    def test_cover_endpoint_negotiates_format(self):
+        self.upload_cover()
+        url = reverse('product-cover', args=[self.product.pk, 'thumb'])
+        client = APIClient()
+
+        response = client.get(url, HTTP_ACCEPT='image/avif,image/webp,*/*')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/webp'))
+        self.assertIn('Accept', response['Vary'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'RIFF'))
+
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = client.get(url, HTTP_ACCEPT='*/*')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/' + self.product.cover_variants['thumb']['jpeg'],
+        )
+
+        missing = reverse('product-cover', args=[self.product.pk, 'huge'])
+        self.assertEqual(client.get(missing).status_code, 404)
+
+    def test_cover_of_inactive_product_is_not_served(self):
+        self.upload_cover()
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        url = reverse('product-cover', args=[self.product.pk, 'thumb'])
+        self.assertEqual(APIClient().get(url).status_code, 404)
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='Long text ' * 50, price=Decimal('10.50'),
+                sku=f'SKU-{i}', stock=100,
+            )
+            for i in range(3)
+        ]
+        for _ in range(5):
+            SaleService.create_sale(self.user, [
+                SaleItem(product=product, quantity=1) for product in self.products
+            ])
+
+    def test_product_fields_trim_response_and_select(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('product-list-create'), {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        product_query = next(q['sql'] for q in ctx.captured_queries if 'src_product' in q['sql'])
+        self.assertNotIn('description', product_query)
+
+        response = self.client.get(reverse('product-list-create'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', str(response.data))
+
+    def test_compact_sales_side_load_each_product_once(self):
+        full = self.client.get(reverse('sale-list-create'))
+        with CaptureQueriesContext(connection) as ctx:
+            compact = self.client.get(reverse('sale-list-create'), {
+                'fields': 'id,items,total_price', 'fields[product]': 'name,price', 'expand': '',
+            })
+        self.assertEqual(compact.status_code, 200)
+        # Sales, their items, then the three distinct products
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        sale = compact.data['results'][0]
+        self.assertEqual(set(sale), {'id', 'items', 'total_price'})
+        self.assertIn(sale['items'][0]['product'], compact.data['products'])
+        self.assertEqual(
+            compact.data['products'][str(self.products[0].pk)], {'name': 'Product 0', 'price': '10.50'}
+        )
+        self.assertEqual(len(compact.data['products']), 3)
+        self.assertLess(len(compact.content) * 5, len(full.content))
+
+    def test_expand_embeds_only_named_relations(self):
+        sale = Sale.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('sale-detail', args=[sale.pk]), {'expand': 'items.product'}
+            )
+        self.assertEqual(response.data['user'], str(self.user.pk))
+        self.assertEqual(response.data['items'][0]['product']['sku'][:4], 'SKU-')
+        self.assertNotIn('products', response.data)
+
+        response = self.client.get(reverse('sale-detail', args=[sale.pk]), {'expand': 'customer'})
+        self.assertEqual(response.status_code, 400)
+
+class RowSerializationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='seller', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        products = [
+            Product.objects.create(
+                name=f'Produto {i}   ç', description='Linha\n"citada"\t\x01', price=Decimal('10.05'),
+                sku=f'SKU-{i}', stock=100, cover_variants={'thumb': {'webp': f'covers/{i}/thumb.webp'}},
+            )
+            for i in range(4)
+        ]
+        for i in range(6):
+            SaleService.create_sale(self.user, [
+                SaleItem(product=product, quantity=i + 1) for product in products[i % 2:]
+            ])
+
+    def get_both(self, url, params=None):
+        responses = []
+        for fast in (False, True):
+            with override_settings(FAST_SERIALIZATION=fast):
+                caches['default'].clear()
+                responses.append(self.client.get(url, params or {}))
+        self.assertEqual(responses[0].status_code, 200)
+        return responses
+
+    def test_fast_path_output_is_byte_identical(self):
+        for url, params in (
+            (reverse('product-list-create'), {}),
+            (reverse('product-list-create'), {'fields': 'name,price,cover_variants'}),
+            (reverse('sale-list-create'), {}),
+            (reverse('sale-list-create'), {'page_size': 2}),
+            (reverse('sale-list-create'), {'expand': '', 'fields[product]': 'sku,updated_at'}),
+            (reverse('sale-list-create'), {'expand': 'user', 'fields': 'id,user,items'}),
+        ):
+            with self.subTest(url=url, params=params):
+                drf, fast = self.get_both(url, params)
+                self.assertEqual(fast.content, drf.content)
+
+    def test_fast_path_query_count_is_constant(self):
+        with override_settings(FAST_SERIALIZATION=True):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse('sale-list-create'))
+            # Sales, their items, the users and the distinct products
+            self.assertEqual(len(ctx.captured_queries), 4)
+
+    def test_unsupported_serializers_are_not_compiled(self):
+        with self.assertRaises(UnsupportedField):
+            RowSerializer(ProductSearchSerializer())
+
+    def test_orjson_renderer_matches_drf(self):
+        data = {
+            'text': 'aspas " barra \\    \x00\x1f\x7f ção 😀',
+            'when': datetime(2024, 5, 1, 12, 30, 15, 120000, tzinfo=timezone.utc),
+            'day': date(2024, 5, 1), 'amount': Decimal('12.50'), 'id': self.user.pk,
+            'nested': [{'n': 1, 'ok': True, 'none': None}, [], {}], 1: 'int key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, **options):
+        out = StringIO()
+        call_command(
+            'generate_dataset', seed=3, end=date(2025, 1, 1), months=3, workers=1,
+            batch_size=40, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_generates_consistent_sales_in_batches(self):
+        out = self.generate(users=30, products=20, sales=100, max_items=3)
+
+        self.assertTrue(User.objects.get(username='admin').check_password('admin'))
+        self.assertEqual(User.objects.filter(username__contains='.3.').count(), 30)
+        self.assertEqual(Product.objects.filter(sku__contains='-3-').count(), 20)
+        self.assertTrue(Product.objects.exclude(search_vector=None).exists())
+        sales = Sale.objects.with_items()
+        self.assertEqual(len(sales), 100)
+        for sale in sales:
+            items = list(sale.items.all())
+            self.assertTrue(1 <= len(items) <= 3)
+            self.assertEqual(len({item.product_id for item in items}), len(items))
+            self.assertEqual(sale.total_amount, sum(item.quantity * item.unit_price for item in items))
+            self.assertTrue(date(2024, 10, 1) <= sale.sale_date.date() <= date(2025, 1, 1))
+
+        revenue = MonthlySalesRollup.objects.aggregate(total=Sum('revenue'))['total']
+        self.assertEqual(revenue, Sale.objects.aggregate(total=Sum('total_amount'))['total'])
+        self.assertIn('Created 80 sales', out)
+        self.assertIn('Successfully generated 30 users, 20 products and 100 sales', out)
+
+    def test_same_seed_generates_same_sales(self):
+        self.generate(users=5, products=10, sales=0)
+
+        def sales():
+            with transaction.atomic():
+                self.generate(users=0, products=0, sales=50)
+                rows = list(Sale.objects.order_by('id').values_list('id', 'user_id', 'sale_date', 'total_amount'))
+                transaction.set_rollback(True)
+            return rows
+
+        self.assertEqual(sales(), sales())
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret123')
+        Product.objects.create(name='Mouse', description='USB', price=Decimal('50.00'), sku='MOU-1', stock=5)
+        self.client.force_login(self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_and_metrics(self):
+        before = self.sample('http_requests_total', method='GET', view='product-list-create', status='200')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('product-list-create'))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, (
+            rf'^db;dur=[\d.]+;desc="{len(ctx.captured_queries)} queries", '
+            r'app;dur=[\d.]+, serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$'
+        ))
+        self.assertEqual(
+            self.sample('http_requests_total', method='GET', view='product-list-create', status='200'), before + 1
+        )
+
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_db_queries_bucket{le="1.0",view="product-list-create"}', response.content)
+        self.assertIn(b'http_response_render_duration_seconds_count{view="product-list-create"}', response.content)
+        self.assertIn(b'http_response_serialize_duration_seconds_count{view="product-list-create"}', response.content)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_async_requests_are_measured(self):
+        # Runs natively async, rather than making the whole chain sync
+        self.assertTrue(ASGIHandler()._middleware_chain.__wrapped__.async_mode)
+        self.async_client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = async_to_sync(self.async_client.get)(reverse('product-list-create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(ctx.captured_queries), 0)
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{len(ctx.captured_queries)} queries", app;dur=[\d.]+, serialize;dur=',
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-secret', SERVER_TIMING=False)
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_slow_sampled_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_MS=0, PROFILE_DIR=profile_dir):
+                self.client.get(reverse('product-list-create'))
+            [name] = os.listdir(profile_dir)
+            self.assertTrue(name.startswith('product-list-create-'))
+            self.assertIn('get_response', pstats.Stats(os.path.join(profile_dir, name)).stats.__repr__())
+
+class BenchmarkAPITests(TestCase):
+    def benchmark(self, baseline, **options):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'benchmark_api', current_db=True, scale=0.005, requests=2, baseline=baseline,
+            stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_saves_and_gates_on_a_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            out, _ = self.benchmark(path, save_baseline=True)
+            self.assertIn('Generating the dataset', out)
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)
+            self.assertEqual(baseline['dataset'], {'users': 1, 'products': 10, 'sales': 100})
+            self.assertEqual(set(baseline['endpoints']), {
+                'login', 'product-list', 'product-search', 'sale-create', 'sale-list',
+                'sale-analytics', 'product-analytics',
+            })
+            # is_active check, the sale page and its prefetched items
+            self.assertEqual(baseline['endpoints']['sale-list']['queries'], 3)
+            self.assertFalse(any(stats['errors'] for stats in baseline['endpoints'].values()))
+
+            out, _ = self.benchmark(path, queries_only=True)
+            self.assertNotIn('Generating the dataset', out)
+            self.assertIn('Successfully matched the baseline', out)
+
+            baseline['endpoints']['sale-list']['queries'] = 2
+            with open(path, 'w') as baseline_file:
+                json.dump(baseline, baseline_file)
+            with self.assertRaisesMessage(CommandError, '1 regressions against'):
+                self.benchmark(path, queries_only=True)
+
+    def test_percentiles_are_nearest_rank(self):
+        latencies = [float(n) for n in range(1, 201)]
+        self.assertEqual(
+            [percentile(latencies, p) for p in (50, 95, 99, 100)], [100.0, 190.0, 198.0, 200.0]
+        )
+        self.assertEqual(percentile([7.0], 99), 7.0)
+
+class ReplayRequestsTests(LiveServerTestCase):
+    def setUp(self):
+        User.objects.create_user(username='replayer', password='secret123')
+        self.product = Product.objects.create(
+            name='Mouse', description='USB', price=Decimal('50.00'), sku='MOU-1', stock=5,
+        )
+
+    def replay(self, lines, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as log:
+            log.write('\n'.join(lines))
+        self.addCleanup(os.remove, log.name)
+        out = StringIO()
+        call_command(
+            'replay_requests', log.name, url=self.live_server_url, username='replayer',
+            password='secret123', concurrency=2, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_replays_and_reports_per_route(self):
+        out = self.replay([
+            json.dumps({'path': '/products/', 'ts': '2025-01-01T10:00:00'}),
+            json.dumps({'path': f'/products/{self.product.pk}/', 'ts': '2025-01-01T10:00:01'}),
+            json.dumps({'path': '/products/00000000-0000-4000-8000-000000000000/'}),
+            json.dumps({'method': 'post', 'path': '/sales/', 'body': {'items': []}}),
+            '{"request_id": "user-001", "title": "Not a request"}',
+            'not json',
+        ], speed=100)
+
+        self.assertRegex(out, r'GET /products/\{id\}/\s+2\s+1\s')
+        self.assertRegex(out, r'GET /products/\s+1\s+0\s')
+        self.assertRegex(out, r'POST /sales/\s+1\s+1\s')
+        self.assertIn('Successfully replayed 4 requests', out)
+        self.assertIn('2 lines skipped', out)
+
+    def test_warm_mode_sends_each_read_once(self):
+        out = self.replay([
+            json.dumps({'path': '/products/'}),
+            json.dumps({'path': '/products/'}),
+            json.dumps({'method': 'DELETE', 'path': f'/products/{self.product.pk}/'}),
+        ], warm=True, rate=50)
+
+        self.assertIn('Successfully replayed 1 requests', out)
+        self.assertTrue(Product.objects.filter(pk=self.product.pk).exists())
@@ -0,0 +1,213 @@
+import hashlib
+import math
+import uuid
+from datetime import timedelta
+from typing import Iterable, Iterator, List, Optional
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+class LocalBitStore:
+    """Bloom filter bits in process memory. Only safe with a single process."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.loaded = False
+
+    def set_bits(self, positions: Iterable[int]) -> None:
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def lookup(self, positions: List[int]) -> Optional[bool]:
+        """Whether every position is set, or None if the filter isn't loaded"""
+        if not self.loaded:
+            return None
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def mark_loaded(self) -> None:
+        self.loaded = True
+
+    def replace(self, batches: Iterable[List[int]]) -> None:
+        """Swap in a filter built from scratch, answering from the old one meanwhile"""
+        fresh = LocalBitStore(self.size)
+        for positions in batches:
+            fresh.set_bits(positions)
+        self.bits, self.loaded = fresh.bits, True
+
+class RedisBitStore:
+    """Bloom filter bits in a Redis string, shared by every worker.
+
+    The bit just past the filter marks it as loaded. Living in the same key,
+    it goes away with the bits if Redis evicts the string, and the filter is
+    reloaded instead of answering "not blacklisted" for every token.
+    """
+
+    def __init__(self, size: int, cache_alias: str):
+        self.size = size
+        cache = caches[cache_alias]
+        self.key = cache.make_key('jwt:blacklist:bloom')
+        self.client = cache._cache.get_client(write=True)
+
+    def set_bits(self, positions: Iterable[int], key: Optional[str] = None) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for position in positions:
+            pipe.setbit(key or self.key, position, 1)
+        pipe.execute()
+
+    def lookup(self, positions: List[int]) -> Optional[bool]:
+        """Whether every position is set, or None if the filter isn't loaded"""
+        # One BITFIELD reads the bits and the loaded marker atomically
+        bitfield = self.client.bitfield(self.key)
+        for position in [*positions, self.size]:
+            bitfield.get('u1', position)
+        *bits, loaded = bitfield.execute()
+        if not loaded:
+            return None
+        return all(bits)
+
+    def mark_loaded(self) -> None:
+        self.client.setbit(self.key, self.size, 1)
+
+    def replace(self, batches: Iterable[List[int]]) -> None:
+        """Build the filter under a temporary key and rename it over the live one"""
+        building = f'{self.key}:building:{uuid.uuid4().hex}'
+        for positions in batches:
+            self.set_bits(positions, building)
+        self.client.setbit(building, self.size, 1)
+        self.client.rename(building, self.key)
+
+class JtiBloomFilter:
+    """Answers "definitely not blacklisted" without touching the token tables.
+
+    The filter holds the JTI of every unexpired blacklisted token. It is loaded
+    from the database the first time it is used and updated on every blacklist,
+    so a negative answer is exact; a positive one is confirmed in the database.
+    """
+
+    def __init__(self, store, capacity: int, error_rate: float):
+        self.store = store
+        self.size = store.size
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.error_rate = error_rate
+
+    @staticmethod
+    def size_for(capacity: int, error_rate: float) -> int:
+        return math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+
+    def _positions(self, jti: str) -> List[int]:
+        digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, jti: str) -> None:
+        self.store.set_bits(self._positions(jti))
+
+    def _batches(self, jtis: Iterable[str]) -> Iterator[List[int]]:
+        positions: List[int] = []
+        for jti in jtis:
+            positions.extend(self._positions(jti))
+            if len(positions) >= 10000:
+                yield positions
+                positions = []
+        if positions:
+            yield positions
+
+    def add_many(self, jtis: Iterable[str]) -> None:
+        for positions in self._batches(jtis):
+            self.store.set_bits(positions)
+
+    def might_contain(self, jti: str) -> bool:
+        positions = self._positions(jti)
+        found = self.store.lookup(positions)
+        if found is None:
+            self.load()
+            found = self.store.lookup(positions)
+        return bool(found)
+
+    @staticmethod
+    def _blacklisted_jtis(since=None):
+        tokens = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        if since is not None:
+            tokens = tokens.filter(blacklisted_at__gte=since)
+        return tokens.values_list('token__jti', flat=True).iterator(chunk_size=5000)
+
+    def load(self) -> None:
+        self.add_many(self._blacklisted_jtis())
+        self.store.mark_loaded()
+
+    def rebuild(self) -> None:
+        """Start over from the database, dropping JTIs of expired tokens.
+
+        The new filter replaces the old one in a single step, so checks keep
+        using the old one until then. Tokens blacklisted while it was being
+        built are added again afterwards, as their bits may have gone to the
+        filter that was replaced.
+        """
+        # Reach back a little for blacklists whose transaction was still open
+        started = timezone.now() - timedelta(minutes=1)
+        self.store.replace(self._batches(self._blacklisted_jtis()))
+        self.add_many(self._blacklisted_jtis(since=started))
+
+_bloom_filter: Optional[JtiBloomFilter] = None
+
+def get_bloom_filter() -> Optional[JtiBloomFilter]:
+    """The configured filter, or None to check the blacklist table directly"""
+    global _bloom_filter
+    backend = settings.JWT_BLACKLIST_BLOOM_BACKEND
+    if not backend:
+        return None
+    if _bloom_filter is None:
+        capacity = settings.JWT_BLACKLIST_BLOOM_CAPACITY
+        error_rate = settings.JWT_BLACKLIST_BLOOM_ERROR_RATE
+        size = JtiBloomFilter.size_for(capacity, error_rate)
+        if backend == 'redis':
+            store = RedisBitStore(size, settings.JWT_BLACKLIST_CACHE_ALIAS)
+        elif backend == 'local':
+            store = LocalBitStore(size)
+        else:
+            raise ValueError(f'Unknown JWT_BLACKLIST_BLOOM_BACKEND: {backend}')
+        _bloom_filter = JtiBloomFilter(store, capacity, error_rate)
+    return _bloom_filter
+
+def reset_bloom_filter() -> None:
+    global _bloom_filter
+    _bloom_filter = None
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check is answered by the Bloom filter first"""
+
+    def check_blacklist(self) -> None:
+        bloom = get_bloom_filter()
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if bloom is not None and not bloom.might_contain(jti):
+            return
+        super().check_blacklist()
+
+    def blacklist(self) -> BlacklistedToken:
+        result = super().blacklist()
+        bloom = get_bloom_filter()
+        if bloom is not None:
+            bloom.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+def estimated_row_count(model) -> int:
+    """Planner estimate of a table's size; cheap even on very large tables"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return max(row[0], 0) if row else 0
+
+def blacklist_table_stats() -> dict:
+    return {
+        'outstanding_tokens': estimated_row_count(OutstandingToken),
+        'blacklisted_tokens': estimated_row_count(BlacklistedToken),
+    }
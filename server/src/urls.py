@@ -1,13 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    ProductListCreateAPIView, ProductRetrieveUpdateDestroyAPIView,
-    SaleListCreateAPIView, SaleRetrieveAPIView,
-    UserListAPIView, SaleItemListAPIView,
+    ProductListCreateAPIView, ProductRetrieveUpdateDestroyAPIView, ProductSearchAPIView,
+    ProductImportAPIView,
+    SaleListCreateAPIView, SaleRetrieveAPIView, SaleBulkCreateAPIView, SaleExportAPIView,
+    UserListAPIView, SaleItemListAPIView, SaleAnalyticsAPIView, ProductSalesAnalyticsAPIView,
     CustomTokenObtainPairView, UserRegistrationView, UserProfileView,
-    logout_view, user_info_view
+    logout_view, user_info_view, product_cover_view, metrics_view, AsyncProductListCreateAPIView,
+    AsyncProductRetrieveUpdateDestroyAPIView, AsyncSaleListCreateAPIView, AsyncSaleRetrieveAPIView
 )
 
+# Under ASGI the product and sale endpoints are served by their async variants
+ASYNC_VIEWS = {
+    ProductListCreateAPIView: AsyncProductListCreateAPIView,
+    ProductRetrieveUpdateDestroyAPIView: AsyncProductRetrieveUpdateDestroyAPIView,
+    SaleListCreateAPIView: AsyncSaleListCreateAPIView,
+    SaleRetrieveAPIView: AsyncSaleRetrieveAPIView,
+}
+
+def endpoint(view):
+    """The view, or its async variant under ASGI, ready to route"""
+    if settings.SERVER_MODE == 'asgi':
+        view = ASYNC_VIEWS.get(view, view)
+    return view.as_view()
+
 urlpatterns = [
     # Authentication endpoints
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token-obtain-pair'),
@@ -18,10 +35,20 @@ urlpatterns = [
     path('auth/profile/', UserProfileView.as_view(), name='user-profile'),
     
     # Existing endpoints
-    path('products/', ProductListCreateAPIView.as_view(), name='product-list-create'),
-    path('products/<uuid:pk>/', ProductRetrieveUpdateDestroyAPIView.as_view(), name='product-detail'),
-    path('sales/', SaleListCreateAPIView.as_view(), name='sale-list-create'),
-    path('sales/<uuid:pk>/', SaleRetrieveAPIView.as_view(), name='sale-detail'),
+    path('products/', endpoint(ProductListCreateAPIView), name='product-list-create'),
+    path('products/search/', ProductSearchAPIView.as_view(), name='product-search'),
+    path('products/import/', ProductImportAPIView.as_view(), name='product-import'),
+    path('products/<uuid:pk>/cover/<str:size>/', product_cover_view, name='product-cover'),
+    path('products/<uuid:pk>/', endpoint(ProductRetrieveUpdateDestroyAPIView), name='product-detail'),
+    path('sales/', endpoint(SaleListCreateAPIView), name='sale-list-create'),
+    path('sales/bulk/', SaleBulkCreateAPIView.as_view(), name='sale-bulk-create'),
+    path('sales/export/', SaleExportAPIView.as_view(), name='sale-export'),
+    path('sales/<uuid:pk>/', endpoint(SaleRetrieveAPIView), name='sale-detail'),
+    path('analytics/sales/', SaleAnalyticsAPIView.as_view(), name='sale-analytics'),
+    path('analytics/products/', ProductSalesAnalyticsAPIView.as_view(), name='product-analytics'),
     path('users/', UserListAPIView.as_view(), name='user-list'),
     path('sale-items/', SaleItemListAPIView.as_view(), name='saleitem-list'),
+
+    # Prometheus scrape target (see src.profiling)
+    path('metrics', metrics_view, name='metrics'),
 ]
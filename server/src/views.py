@@ -1,49 +1,550 @@
-from rest_framework import generics, permissions, status
+from adrf import generics as async_generics
+from asgiref.sync import sync_to_async
+from rest_framework import generics, mixins, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import hmac
+import io
+import mimetypes
+import re
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from typing import Dict, Optional, Set
 from .serializers import (
     ProductSerializer, SaleSerializer, UserSerializer, SaleItemSerializer,
-    CustomTokenObtainPairSerializer, UserRegistrationSerializer, UserProfileSerializer
+    CustomTokenObtainPairSerializer, UserRegistrationSerializer, UserProfileSerializer,
+    SaleInputSerializer, UserSalesByMonthSerializer, MonthSalesByUserSerializer,
+    ProductMonthSalesSerializer, ProductSearchSerializer
 )
-from .models import Product, Sale, User, SaleItem
+from .models import Product, Sale, User, SaleItem, serialized_columns
+from .authentication import get_request_user, load_user
+from .cache import AsyncCatalogCacheMixin, CatalogCacheMixin
+from .images import COVER_SIZES, media_response
+from .services import (
+    SaleService, SaleAnalyticsService, SaleExportService, ProductService, ProductImportService,
+)
+from .tokens import CachedBlacklistRefreshToken
+from .profiling import SerializationTimingMixin, metrics_payload, start_serializing
+from .renderers import ORJSONRenderer
+from .row_serializers import RowSerializer, UnsupportedField
+from .pagination import (
+    ProductCursorPagination, SaleCursorPagination,
+    SaleItemCursorPagination, UserCursorPagination, ProductRollupCursorPagination,
+    ProductSearchCursorPagination
+)
+
+FIELDSET_PARAM = re.compile(r'fields\[(\w+)\]')
+
+def _split_param(value: str) -> Set[str]:
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class SparseFieldsetViewMixin:
+    """``?fields=``, ``?fields[<type>]=`` and ``?expand=`` on GET requests.
+
+    ``?fields=`` names the fields of the view's own resource, ``?fields[product]=``
+    those of products wherever they appear. ``?expand=`` lists which of the
+    ``expandable`` relations to embed; the others are given by id.
+    """
+    expandable = ()
+
+    def get_fieldsets(self) -> Dict[str, Set[str]]:
+        if not hasattr(self, '_fieldsets'):
+            self._fieldsets = {}
+            if self.request.method == 'GET':
+                for key, value in self.request.query_params.items():
+                    if key == 'fields':
+                        self._fieldsets[self.get_serializer_class().resource_type] = _split_param(value)
+                    elif match := FIELDSET_PARAM.fullmatch(key):
+                        self._fieldsets[match[1]] = _split_param(value)
+        return self._fieldsets
+
+    def get_expand(self) -> Optional[Set[str]]:
+        """The relations to embed, or None when ``?expand=`` is absent (all of them)"""
+        value = self.request.query_params.get('expand')
+        if self.request.method != 'GET' or value is None:
+            return None
+        expand = _split_param(value)
+        unknown = expand - set(self.expandable)
+        if unknown:
+            raise ValidationError({'expand': f'Unknown relations: {", ".join(sorted(unknown))}.'})
+        return expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldsets'] = self.get_fieldsets()
+        context['expand'] = self.get_expand()
+        return context
+
+class ProductFieldsetMixin(SparseFieldsetViewMixin):
+    """Loads only the columns behind the requested product fields"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_fieldsets().get('product')
+        if fields is None:
+            return queryset
+        # Keyset pagination reads the ordering columns of every row
+        ordering = [name.lstrip('-') for name in getattr(self.pagination_class, 'ordering', ())]
+        return queryset.only(*serialized_columns(Product, [*fields, *ordering]))
+
+class SaleFieldsetMixin(SparseFieldsetViewMixin):
+    """Loads what the requested sale representation needs.
+
+    When ``?expand=`` leaves out ``items.product``, items reference products
+    by id and list responses side-load each distinct product once, in a
+    ``products`` map keyed by id.
+    """
+    expandable = ('user', 'items.product')
+
+    def get_queryset(self):
+        fieldsets = self.get_fieldsets()
+        return super().get_queryset().for_fieldsets(
+            fieldsets.get('sale'), fieldsets.get('product'), self.get_expand()
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        expand = context['expand']
+        if self.paginator is not None and expand is not None and 'items.product' not in expand:
+            context['sideloaded_products'] = self._sideloaded_products = {}
+        return context
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        sideloaded = getattr(self, '_sideloaded_products', None)
+        if sideloaded is not None:
+            response.data['products'] = self._sideloaded_representation(sideloaded)
+        return response
+
+    def _sideloaded_representation(self, sideloaded):
+        context = {'request': self.request, 'fieldsets': self.get_fieldsets()}
+        if None not in sideloaded.values():
+            products = ProductSerializer(list(sideloaded.values()), many=True, context=context).data
+            return dict(zip(map(str, sideloaded), products))
+        # A RowSerializer only collected the ids
+        rows = RowSerializer(ProductSerializer(context=context))
+        by_pk = {
+            row[rows.pk_key]: row
+            for row in rows.values(Product.objects.filter(pk__in=list(sideloaded)))
+        }
+        products = rows.to_representation(by_pk[pk] for pk in sideloaded if pk in by_pk)
+        return dict(zip((str(pk) for pk in sideloaded if pk in by_pk), products))
+
+class RowSerializationMixin:
+    """Serves list GETs through a RowSerializer and orjson when FAST_SERIALIZATION is on.
+
+    Falls back to the view's serializer if one of its fields cannot be compiled.
+    """
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not settings.FAST_SERIALIZATION:
+            return renderers
+        return [ORJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
+
+    def get_row_serializer(self) -> Optional[RowSerializer]:
+        if not settings.FAST_SERIALIZATION:
+            return None
+        try:
+            return RowSerializer(self.get_serializer())
+        except UnsupportedField:
+            return None
+
+    def get_row_queryset(self, rows: RowSerializer):
+        # Keyset pagination reads the ordering columns of every row
+        ordering = [name.lstrip('-') for name in getattr(self.pagination_class, 'ordering', ())]
+        return rows.values(self.filter_queryset(self.get_queryset()), *ordering)
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.get_row_queryset(rows)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(rows.to_representation(queryset))
+        return self.get_paginated_response(rows.to_representation(page))
+
+class ProductListCreateAPIView(
+    CatalogCacheMixin, ProductFieldsetMixin, RowSerializationMixin, SerializationTimingMixin,
+    generics.ListCreateAPIView
+):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProductCursorPagination
+
+class ProductSearchAPIView(SerializationTimingMixin, generics.ListAPIView):
+    """Products ranked by full-text and trigram relevance to ``?q=``"""
+    serializer_class = ProductSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProductSearchCursorPagination
+
+    def get_queryset(self):
+        search_term = self.request.query_params.get('q', '').strip()
+        if not search_term:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        return ProductService.get_products_with_stats(search_term=search_term)
+
+class ProductImportAPIView(APIView):
+    """Upsert products on SKU from an uploaded CSV or NDJSON feed.
+
+    Multipart fields: ``file`` and optionally ``format`` (``csv`` or
+    ``ndjson``, otherwise taken from the file name). Feeds too large for the
+    request timeout should go through the import_products command instead.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+    max_reported_errors = 100
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'This field is required.'})
+        import_format = request.data.get('format') or ProductImportService.format_of(upload.name)
+        if import_format not in ProductImportService.FORMATS:
+            raise ValidationError({'format': "Expected 'csv' or 'ndjson'."})
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        rows = ProductImportService.read(stream, import_format)
+        processed = upserted = rejected = 0
+        reported = []
+        try:
+            for processed, upserted, errors in ProductImportService.import_products(rows):
+                rejected += len(errors)
+                reported.extend(
+                    {'line': line, 'errors': row_errors} for line, row_errors in errors
+                )
+        except UnicodeDecodeError:
+            raise ValidationError({'file': 'The file must be UTF-8 encoded.'})
+
+        return Response({
+            'processed': processed,
+            'upserted': upserted,
+            'rejected': rejected,
+            'errors': reported[:self.max_reported_errors],
+        })
+
+@require_GET
+def product_cover_view(request, pk, size):
+    """A product's cover at one size, WebP when the client accepts it.
+
+    Deliberately public, so <img> tags can load it without a token, and
+    only for active products: a deactivated product's cover is a 404.
+    Django picks the file and nginx sends it.
+    """
+    if size not in COVER_SIZES:
+        raise Http404
+    product = get_object_or_404(
+        Product.objects.filter(is_active=True).only('cover_image', 'cover_variants'), pk=pk
+    )
+    extension = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    path = product.cover_variants.get(size, {}).get(extension)
+    if path is None:
+        # Variants not generated yet: fall back to the original upload
+        if not product.cover_image:
+            raise Http404
+        path = product.cover_image.name
+
+    response = media_response(path, mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    patch_vary_headers(response, ['Accept'])
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@require_GET
+def metrics_view(request):
+    """Request metrics in the Prometheus text format, for scraping"""
+    if settings.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return HttpResponse(status=401)
+    payload, content_type = metrics_payload()
+    return HttpResponse(payload, content_type=content_type)
+
+class ProductRetrieveUpdateDestroyAPIView(
+    CatalogCacheMixin, ProductFieldsetMixin, SerializationTimingMixin,
+    generics.RetrieveUpdateDestroyAPIView
+):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'pk'
+
+class SaleListCreateAPIView(
+    SaleFieldsetMixin, RowSerializationMixin, SerializationTimingMixin, generics.ListCreateAPIView
+):
+    queryset = Sale.objects.all()
+    serializer_class = SaleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SaleCursorPagination
+
+    def perform_create(self, serializer):
+        # SaleSerializer.create reserves stock through SaleService
+        serializer.save(user=get_request_user(self.request))
+
+class SaleBulkCreateAPIView(generics.GenericAPIView):
+    """Create many sales in one request, e.g. when a POS terminal syncs.
+
+    At most SALES_BULK_MAX sales and SALES_BULK_MAX_ITEMS line items per
+    request, as they are created in one transaction under product locks.
+    """
+    serializer_class = SaleInputSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=settings.SALES_BULK_MAX
+        )
+        serializer.is_valid(raise_exception=True)
+        item_count = sum(len(order['items']) for order in serializer.validated_data)
+        if item_count > settings.SALES_BULK_MAX_ITEMS:
+            raise ValidationError({
+                'items': f'Expected at most {settings.SALES_BULK_MAX_ITEMS} items, got {item_count}.'
+            })
+
+        user = get_request_user(request)
+        orders = []
+        for order in serializer.validated_data:
+            sale = Sale(user=user)
+            if 'sale_date' in order:
+                sale.sale_date = order['sale_date']
+            items = [
+                SaleItem(product_id=item['product_id'], quantity=item['quantity'])
+                for item in order['items']
+            ]
+            orders.append((sale, items))
+
+        try:
+            sales = SaleService.create_sales(orders)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+
+        queryset = Sale.objects.with_details().filter(
+            pk__in=[sale.pk for sale in sales]
+        ).order_by('-sale_date', '-id')
+        return Response(
+            SaleSerializer(queryset, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
 
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class SaleRetrieveAPIView(SaleFieldsetMixin, SerializationTimingMixin, generics.RetrieveAPIView):
+    queryset = Sale.objects.all()
+    serializer_class = SaleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'pk'
+
+class AsyncListMixin(RowSerializationMixin):
+    """List GET that fetches the page with the async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is not None:
+            page = await self.paginator.apaginate_queryset(
+                self.get_row_queryset(rows), request, view=self
+            )
+            start_serializing(request)
+            # Nested lists and side-loaded products are further queries
+            return await sync_to_async(
+                lambda: self.get_paginated_response(rows.to_representation(page))
+            )()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        start_serializing(request)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class AsyncRetrieveMixin:
+    """Detail GET that loads the object with the async ORM (aget)"""
+
+    async def get(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        start_serializing(request)
+        return Response(self.get_serializer(instance).data)
+
+# Variants of the catalog and sale views for the ASGI stack (SERVER_MODE=asgi).
+# Reads run on the async ORM; writes reuse DRF's sync mixins in a thread.
+
+class AsyncProductListCreateAPIView(
+    AsyncCatalogCacheMixin, ProductFieldsetMixin, AsyncListMixin, mixins.CreateModelMixin,
+    SerializationTimingMixin, async_generics.GenericAPIView
+):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProductCursorPagination
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
 
-class ProductRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class AsyncProductRetrieveUpdateDestroyAPIView(
+    AsyncCatalogCacheMixin, ProductFieldsetMixin, AsyncRetrieveMixin, mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin, SerializationTimingMixin, async_generics.GenericAPIView
+):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'pk'
 
-class SaleListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Sale.objects.all().order_by('-sale_date')
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.update)(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await sync_to_async(self.partial_update)(request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await sync_to_async(self.destroy)(request, *args, **kwargs)
+
+class AsyncSaleListCreateAPIView(
+    SaleFieldsetMixin, AsyncListMixin, mixins.CreateModelMixin, SerializationTimingMixin,
+    async_generics.GenericAPIView
+):
+    queryset = Sale.objects.all()
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SaleCursorPagination
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=get_request_user(self.request))
 
-class SaleRetrieveAPIView(generics.RetrieveAPIView):
+class AsyncSaleRetrieveAPIView(
+    SaleFieldsetMixin, AsyncRetrieveMixin, SerializationTimingMixin, async_generics.GenericAPIView
+):
     queryset = Sale.objects.all()
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'pk'
 
-class UserListAPIView(generics.ListAPIView):
+def parse_date_param(request, name: str) -> Optional[date]:
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+    return parsed
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Content negotiation that leaves ``?format=`` to the export encoding"""
+    settings = SimpleNamespace(URL_FORMAT_OVERRIDE=None)
+
+async def _stream_async(chunks):
+    # Under ASGI a sync iterator would be read to the end before sending; pull
+    # it chunk by chunk on the request's thread instead, where its cursor lives
+    next_chunk = sync_to_async(lambda: next(chunks, None))
+    try:
+        while (chunk := await next_chunk()) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+class SaleExportAPIView(APIView):
+    """Sale lines as CSV or NDJSON, streamed while they are read.
+
+    Query params: ``format`` (``csv`` or ``ndjson``), ``from`` and ``to``
+    (YYYY-MM-DD, both inclusive).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
+    encoders = {
+        'csv': (SaleExportService.stream_csv, 'text/csv; charset=utf-8'),
+        'ndjson': (SaleExportService.stream_ndjson, 'application/x-ndjson'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in self.encoders:
+            raise ValidationError({'format': "Expected 'csv' or 'ndjson'."})
+        start = parse_date_param(request, 'from')
+        end = parse_date_param(request, 'to')
+
+        rows = SaleExportService.rows(
+            start=start and timezone.make_aware(datetime.combine(start, time.min)),
+            end=end and timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+        encode, content_type = self.encoders[export_format]
+        chunks = encode(rows)
+        response = StreamingHttpResponse(
+            _stream_async(chunks) if settings.SERVER_MODE == 'asgi' else chunks,
+            content_type=content_type,
+        )
+        filename = f'sales-{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+def parse_start_month(request) -> date:
+    """First month covered by an analytics request, from ``?start=YYYY-MM-DD``"""
+    start_date = parse_date_param(request, 'start')
+    if start_date is None:
+        return (timezone.localdate() - timedelta(days=365)).replace(day=1)
+    return start_date.replace(day=1)
+
+class SaleAnalyticsAPIView(SerializationTimingMixin, APIView):
+    """Sales totals per user and month, read from MonthlySalesRollup.
+
+    Query params: ``start`` (YYYY-MM-DD, rounded down to the month, defaults
+    to one year ago), ``group_by`` (``user`` or ``month``) and
+    ``include_sales`` to also list the sales behind each total.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        start_month = parse_start_month(request)
+        group_by = request.query_params.get('group_by', 'user')
+        include_sales = request.query_params.get('include_sales', '').lower() in ('1', 'true')
+        sales = Sale.objects.with_details().order_by('-sale_date')
+        context = {'include_sales': include_sales}
+
+        if group_by == 'user':
+            grouped = SaleAnalyticsService.rollup_by_user_and_month(start_month, sales)
+            serializer = UserSalesByMonthSerializer(grouped, many=True, context=context)
+        elif group_by == 'month':
+            grouped = SaleAnalyticsService.rollup_by_month_and_user(start_month, sales)
+            serializer = MonthSalesByUserSerializer(grouped, many=True, context=context)
+        else:
+            raise ValidationError({'group_by': "Expected 'user' or 'month'."})
+
+        self.start_serializing()
+        return Response(serializer.data)
+
+class ProductSalesAnalyticsAPIView(SerializationTimingMixin, generics.ListAPIView):
+    """Quantity and revenue per product and month, read from MonthlySalesRollup"""
+    serializer_class = ProductMonthSalesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProductRollupCursorPagination
+
+    def get_queryset(self):
+        return SaleAnalyticsService.rollup_by_product_and_month(parse_start_month(self.request))
+
+class UserListAPIView(SerializationTimingMixin, generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserCursorPagination
 
-class SaleItemListAPIView(generics.ListAPIView):
-    queryset = SaleItem.objects.all()
+class SaleItemListAPIView(SerializationTimingMixin, generics.ListAPIView):
+    queryset = SaleItem.objects.select_related('product')
     serializer_class = SaleItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SaleItemCursorPagination
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom JWT token obtain view"""
@@ -60,8 +561,8 @@ class UserRegistrationView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Generate tokens for the new user
-        refresh = RefreshToken.for_user(user)
+        # Generate tokens for the new user, with the claims stateless auth relies on
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
         
         return Response({
             'user': UserProfileSerializer(user).data,
@@ -69,13 +570,16 @@ class UserRegistrationView(generics.CreateAPIView):
             'access': str(refresh.access_token),
         }, status=status.HTTP_201_CREATED)
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(SerializationTimingMixin, generics.RetrieveUpdateAPIView):
     """User profile view - get and update current user's profile"""
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return get_request_user(self.request)
+        # Updates save every field, so start from the row rather than a cached copy
+        return load_user(self.request.user.pk)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -84,7 +588,7 @@ def logout_view(request):
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -94,5 +598,5 @@ def logout_view(request):
 @permission_classes([permissions.IsAuthenticated])
 def user_info_view(request):
     """Get current user information"""
-    serializer = UserProfileSerializer(request.user)
+    serializer = UserProfileSerializer(get_request_user(request))
     return Response(serializer.data)